@@ -3,5 +3,5 @@ from setuptools import setup, find_packages
 setup(
     name="onboarding-agents",
     version="0.1",
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests"]),
 )
\ No newline at end of file
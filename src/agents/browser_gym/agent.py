@@ -1,33 +1,99 @@
 
 import dataclasses
 import logging
+import time
+from functools import partial
+from typing import ClassVar, Optional
 import openai
 from browsergym.core.action.highlevel import HighLevelActionSet
 from browsergym.core.action.python import PythonActionSet
 from browsergym.experiments import AbstractAgentArgs, Agent
 from browsergym.utils.obs import flatten_axtree_to_str, flatten_dom_to_str, prune_html
 
+from src.agents.browser_gym.axtree_diff import AXTreeDiffer
+from src.agents.browser_gym.custom_action_mapping import get_workflow_registry
+from src.agents.browser_gym.decision_cache import DecisionCache, fingerprint
+from src.agents.browser_gym.history import HistoryManager
+from src.agents.browser_gym.observation import LazyObservation
+from src.agents.browser_gym.prompt_budget import AssembledPrompt, PromptAssembler, PromptSection, trim_deepest_lines, trim_oldest_first, trim_tail
+from src.agents.browser_gym.replay import ReplayEngine
 from src.agents.browser_gym.utils import deduplicate_axtree, image_to_jpg_base64_url
+from src.agents.browser_gym.workflow_space import WorkflowActionSpace
 
 logger = logging.getLogger(__name__)
 
+CHAT_INSTRUCTIONS = """\
+# Instructions
+
+You are a UI Assistant, your goal is to help the user perform tasks using a web browser. You can
+communicate with the user via a chat, to which the user gives you instructions and to which you
+can send back messages. You have access to a web browser that both you and the user can see,
+and with which only you can interact via specific commands.
+
+Review the instructions from the user, the current state of the page and all other information
+to find the best possible next action to accomplish your goal. Your answer will be interpreted
+and executed by a program, make sure to follow the formatting instructions.
+"""
+
+GOAL_INSTRUCTIONS = """\
+# Instructions
+
+Review the current state of the page and all other information to find the best
+possible next action to accomplish your goal. Your answer will be interpreted
+and executed by a program, make sure to follow the formatting instructions.
+"""
+
+# the standard action space description is filled in once per agent, see DemoAgent.render_static_prompt;
+# the workflow action space depends on the page and is added per step, see WorkflowActionSpace
+ACTION_SPACE_PROMPT = r'''
+# Standard Action Space
+{action_space_description}
+
+Please use the following format to select an action from either the standard action space or the workflow action space:
+- For standard actions: STANDARD.<action_name>(<args>)  e.g., STANDARD.click(bid='123')
+- For workflow actions: WORKFLOW.<action_name>(<args>) e.g., WORKFLOW.open_page(url='https://example.com')    
+
+Please also prepend your action choice with chain-of-thought reasoning and wrap your action choice in triple backticks on a newline like these examples:
+
+I now need to click on the Submit button to send the form. I will use the click action on the button, which has bid 12.
+```STANDARD.click("12")```
+
+I found the information requested by the user, I will send it to the chat.
+```STANDARD.send_msg_to_user("The price for a 15\\" laptop is 1499 USD.")```
+
+I see date input fields in the query build form and it looks the set_date_range function in our workflow libary was written for this so I'll just use that directly.
+```WORKFLOW.set_date_range(start_date='2020-01', end_date='2024-12')```
+        '''
+
+def axtree_txt_view(axtree_object: dict) -> str:
+    return deduplicate_axtree(flatten_axtree_to_str(axtree_object), threshold=50)
+
+def pruned_html_view(dom_object: dict) -> str:
+    return prune_html(flatten_dom_to_str(dom_object))
+
 class DemoAgent(Agent):
     """A basic agent using OpenAI API, to demonstrate BrowserGym's functionalities."""
 
     def obs_preprocessor(self, obs: dict) -> dict:
-
-        return {
+        """Keep the raw fields the agent uses and register the configured views to be computed lazily"""
+        values = {
             "chat_messages": obs["chat_messages"],
-            "screenshot": obs["screenshot"],
             "goal_object": obs["goal_object"],
             "last_action": obs["last_action"],
             "last_action_error": obs["last_action_error"],
             "open_pages_urls": obs["open_pages_urls"],
             "open_pages_titles": obs["open_pages_titles"],
             "active_page_index": obs["active_page_index"],
-            "axtree_txt": deduplicate_axtree(flatten_axtree_to_str(obs["axtree_object"]), threshold=50),
-            "pruned_html": prune_html(flatten_dom_to_str(obs["dom_object"])),
         }
+        if self.use_screenshot:
+            values["screenshot"] = obs["screenshot"]
+
+        views = {}
+        if self.use_axtree:
+            views["axtree_txt"] = partial(axtree_txt_view, obs["axtree_object"])
+        if self.use_html:
+            views["pruned_html"] = partial(pruned_html_view, obs["dom_object"])
+        return LazyObservation(values, views)
 
     def __init__(
         self,
@@ -37,6 +103,15 @@ class DemoAgent(Agent):
         use_html: bool,
         use_axtree: bool,
         use_screenshot: bool,
+        use_axtree_diff: bool = False,
+        max_prompt_tokens: Optional[int] = None,
+        history_keep_recent: int = 5,
+        summarize_history: bool = False,
+        workflow_top_k: int = 8,
+        workflow_max_tokens: int = 2000,
+        replay: bool = False,
+        replay_session: Optional[str] = None,
+        decision_cache_path: Optional[str] = None,
     ) -> None:
         super().__init__()
         self.model_name = model_name
@@ -44,6 +119,14 @@ class DemoAgent(Agent):
         self.use_html = use_html
         self.use_axtree = use_axtree
         self.use_screenshot = use_screenshot
+        # after the first step on a page, send only what changed in the AXTree
+        self.axtree_differ = AXTreeDiffer() if use_axtree_diff else None
+        # defaults to the model's context window minus room for the response
+        self.prompt_assembler = PromptAssembler(model_name, max_prompt_tokens)
+        # only the top-k learned workflows for the current page, within a token budget
+        self.workflow_space = WorkflowActionSpace(
+            get_workflow_registry(), self.prompt_assembler.counter, top_k=workflow_top_k, max_tokens=workflow_max_tokens
+        )
 
         if not (use_html or use_axtree):
             raise ValueError(f"Either use_html or use_axtree must be set to True.")
@@ -58,42 +141,82 @@ class DemoAgent(Agent):
             demo_mode=demo_mode,  # add visual effects
         )
 
-        self.action_history = []
+        # last few responses verbatim, older steps as compact action/outcome records
+        self.history = HistoryManager(
+            keep_recent=history_keep_recent,
+            summarize=self.summarize_steps if summarize_history else None,
+        )
 
-    def get_action(self, obs: dict) -> tuple[str, dict]:
-        system_msgs = []
-        user_msgs = []
+        # instructions and action space never change during an episode: render them once and
+        # reuse them byte-identically at the start of every prompt so the provider's prompt cache hits
+        self.static_prompt = self.render_static_prompt()
+        # replay a matching demonstration without the model, see replay_action
+        self.replay = replay or replay_session is not None
+        self.replay_session = replay_session
+        self.replay_engine: Optional[ReplayEngine] = None
+        # reuse decisions that worked on structurally identical pages, see cached_action
+        self.decision_cache = DecisionCache(decision_cache_path) if decision_cache_path and use_axtree else None
+        self._decision_key: Optional[str] = None
+        self.prompt_tokens_total = 0
+        self.cached_tokens_total = 0
+
+    def render_static_prompt(self) -> list[dict]:
+        """The invariant part of the prompt: instructions and action space"""
+        action_space = ACTION_SPACE_PROMPT.format(
+            action_space_description=self.action_set.describe(with_long_description=False, with_examples=True)
+        )
+        instructions = CHAT_INSTRUCTIONS if self.chat_mode else GOAL_INSTRUCTIONS
+        return [{"type": "text", "text": instructions}, {"type": "text", "text": action_space}]
 
-        if self.chat_mode:
-            system_msgs.append(
-                {
-                    "type": "text",
-                    "text": f"""\
-# Instructions
+    def summarize_steps(self, summary: str, records: list[str]) -> str:
+        """Fold action/outcome records into the running summary of the episode (runs in the background)"""
+        new_steps = "\n".join(records)
+        response = self.openai_client.chat.completions.create(
+            model=self.model_name,
+            messages=[{
+                "role": "user",
+                "content": f"""\
+Update the summary of a web agent's progress with the steps below. Keep what was achieved, what is
+left to do and which actions failed and why, in at most 10 short lines.
 
-You are a UI Assistant, your goal is to help the user perform tasks using a web browser. You can
-communicate with the user via a chat, to which the user gives you instructions and to which you
-can send back messages. You have access to a web browser that both you and the user can see,
-and with which only you can interact via specific commands.
+# Current summary
+{summary or "(none)"}
 
-Review the instructions from the user, the current state of the page and all other information
-to find the best possible next action to accomplish your goal. Your answer will be interpreted
-and executed by a program, make sure to follow the formatting instructions.
+# New steps
+{new_steps}
 """,
-                }
-            )
+            }],
+        )
+        return response.choices[0].message.content.strip()
+
+    def page_context(self, obs: dict) -> tuple[str, str, str]:
+        """URL and title of the active page and the goal's text, what the workflow action space is retrieved with"""
+        if self.chat_mode:
+            goal = next((msg["message"] for msg in reversed(obs["chat_messages"]) if msg["role"] == "user"), "")
+        else:
+            goal = "\n".join(part["text"] for part in obs["goal_object"] if part.get("type") == "text")
+        active_page = obs["active_page_index"]
+        return obs["open_pages_urls"][active_page], obs["open_pages_titles"][active_page], goal
+
+    def build_prompt(self, obs: dict) -> AssembledPrompt:
+        """Assemble this step's prompt from the static prefix, the observation and the history"""
+        self.history.set_last_outcome(obs["last_action_error"])
+        # the static prompt goes first so every step shares the same cacheable prefix
+        sections = [PromptSection("static", self.static_prompt, priority=100, system=True)]
+
+        if self.chat_mode:
             # append chat messages
-            user_msgs.append(
+            chat_msgs = [
                 {
                     "type": "text",
                     "text": f"""\
 # Chat Messages
 """,
                 }
-            )
+            ]
             for msg in obs["chat_messages"]:
                 if msg["role"] in ("user", "assistant", "infeasible"):
-                    user_msgs.append(
+                    chat_msgs.append(
                         {
                             "type": "text",
                             "text": f"""\
@@ -102,49 +225,48 @@ and executed by a program, make sure to follow the formatting instructions.
                         }
                     )
                 elif msg["role"] == "user_image":
-                    user_msgs.append({"type": "image_url", "image_url": msg["message"]})
+                    chat_msgs.append({"type": "image_url", "image_url": msg["message"]})
                 else:
                     raise ValueError(f"Unexpected chat message role {repr(msg['role'])}")
+            # the oldest chat messages go first if the prompt is over budget
+            sections.append(PromptSection("chat", chat_msgs, priority=60, trim=trim_oldest_first))
 
         else:
             assert obs["goal_object"], "The goal is missing."
-            system_msgs.append(
-                {
-                    "type": "text",
-                    "text": f"""\
-# Instructions
-
-Review the current state of the page and all other information to find the best
-possible next action to accomplish your goal. Your answer will be interpreted
-and executed by a program, make sure to follow the formatting instructions.
-""",
-                }
-            )
             # append goal
-            user_msgs.append(
+            goal_msgs = [
                 {
                     "type": "text",
                     "text": f"""\
 # Goal
 """,
                 }
-            )
+            ]
             # goal_object is directly presented as a list of openai-style messages
-            user_msgs.extend(obs["goal_object"])
+            goal_msgs.extend(obs["goal_object"])
+            sections.append(PromptSection("goal", goal_msgs, priority=100))
+
+        # append the learned workflows relevant to this page and goal
+        sections.append(PromptSection("workflows", [
+            {
+                "type": "text",
+                "text": self.workflow_space.render(*self.page_context(obs), self.history.last_workflow()),
+            }
+        ], priority=75))
 
         # append url of all open tabs
-        user_msgs.append(
+        tab_msgs = [
             {
                 "type": "text",
                 "text": f"""\
 # Currently open tabs
 """,
             }
-        )
+        ]
         for page_index, (page_url, page_title) in enumerate(
             zip(obs["open_pages_urls"], obs["open_pages_titles"])
         ):
-            user_msgs.append(
+            tab_msgs.append(
                 {
                     "type": "text",
                     "text": f"""\
@@ -154,193 +276,75 @@ Tab {page_index}{" (active tab)" if page_index == obs["active_page_index"] else
 """,
                 }
             )
+        sections.append(PromptSection("tabs", tab_msgs, priority=80, trim=trim_tail))
 
         # append page AXTree (if asked)
         if self.use_axtree:
-            user_msgs.append(
+            axtree_txt, full_axtree = obs["axtree_txt"], True
+            if self.axtree_differ:
+                active_url = obs["open_pages_urls"][obs["active_page_index"]]
+                axtree_txt, full_axtree = self.axtree_differ.render(
+                    obs["axtree_txt"], active_url, force_full=bool(obs["last_action_error"])
+                )
+            heading = "Current page Accessibility Tree" if full_axtree else "Accessibility Tree changes since the last step"
+            # deep branches of the AXTree are dropped first when over budget
+            sections.append(PromptSection("axtree", [
                 {
                     "type": "text",
                     "text": f"""\
-# Current page Accessibility Tree
+# {heading}
 
-{obs["axtree_txt"][:1048500]}
+{axtree_txt}
 
 """,
                 }
-            )
+            ], priority=50, trim=trim_deepest_lines))
         # append page HTML (if asked)
         if self.use_html:
-            user_msgs.append(
+            sections.append(PromptSection("html", [
                 {
                     "type": "text",
                     "text": f"""\
 # Current page DOM
 
-{obs["pruned_html"][:1048500]}
+{obs["pruned_html"]}
 
 """,
                 }
-            )
+            ], priority=40, trim=trim_tail))
 
         # append page screenshot (if asked)
         if self.use_screenshot:
-            user_msgs.append(
+            sections.append(PromptSection("screenshot", [
                 {
                     "type": "text",
                     "text": """\
 # Current page Screenshot
 """,
-                }
-            )
-            user_msgs.append(
+                },
                 {
                     "type": "image_url",
                     "image_url": {
                         "url": image_to_jpg_base64_url(obs["screenshot"]),
                         "detail": "auto",
                     },  # Literal["low", "high", "auto"] = "auto"
-                }
-            )
-
-        # append action space description
-        action_space_raw = r'''
-# Standard Action Space
-{action_space_description}
-
-# Workflow Action Space - A library atomic subworkflows that your employer demonstrated to you that might be relevant to this task.
-
-def navigate_to_data_source(page: Page) -> None:
-    """
-    Navigate to the data retrieval tab and select Compustat Annual Fundamentals for North America.
-    """
-    assert "wrds" in page.url, "Not on the WRDS page!"
-    page.get_by_role("tab", name=" Get Data ").click()
-    page.get_by_role("link", name="Compustat - Capital IQ", exact=True).click()
-    page.get_by_role("link", name=" North America 19 child items").click()
-    page.get_by_role("link", name="Fundamentals Annual").click()
-
-def set_date_range(page: Page, start_date: str, end_date: str) -> None:
-    """
-    Set the date range for data retrieval.
-    :param start_date: The start date in YYYY-MM format.
-    :param end_date: The end date in YYYY-MM format.
-    """
-    page.get_by_role("textbox", name="Start Date").fill(start_date)
-    page.get_by_role("textbox", name="End Date").fill(end_date)
-
-def enter_ticker(page: Page, ticker: str) -> None:
-    """
-    Enter the company's ticker symbol.
-    :param ticker: The ticker symbol for the company.
-    """
-    combobox = page.get_by_role("combobox", name="Search Name or Ticker")
-    combobox.fill(ticker)
-    combobox.press("Enter")
-
-def add_variables(page: Page, variables: list) -> None:
-    """
-    Add the desired variables to the analysis. Only supports "tic", "revt", "dltt", "dt", "dlc" right now
-    :param variables: A list of variables to select.
-    """
-    search_box = page.get_by_role("textbox", name="Search All")
-    
-    for variable in variables:
-        # Clear any existing text, fill with the variable name
-        search_box.click()
-        search_box.fill(variable)
-        
-        # Find and click the variable in the dropdown
-        # The selector may need adjustment based on the actual page structure
-        # Wait a moment for the dropdown to populate
-        time.sleep(0.5)
-        
-        # Using a more specific selector based on your working approach
-        if variable == "tic":
-            page.locator("#select_all_container_div-08689682-4bdf-3947-97d8-433f285f28a9, [id^='select_all_container_div']").get_by_text("Ticker Symbol (tic)").click()
-        elif variable == "revt":
-            page.locator("#select_all_container_div-08689682-4bdf-3947-97d8-433f285f28a9, [id^='select_all_container_div']").get_by_text("Revenue - Total (revt)").click()
-        elif variable == "dltt":
-            page.locator("#select_all_container_div-08689682-4bdf-3947-97d8-433f285f28a9, [id^='select_all_container_div']").get_by_text("Long-Term Debt - Total (dltt)").click()
-        elif variable == "dt":
-            page.locator("#select_all_container_div-08689682-4bdf-3947-97d8-433f285f28a9, [id^='select_all_container_div']").get_by_text("Total Debt Including Current").click()
-        elif variable == "dlc":
-            page.locator("#select_all_container_div-08689682-4bdf-3947-97d8-433f285f28a9, [id^='select_all_container_div']").get_by_text("Debt in Current Liabilities").click()
-
-def set_output_options(page: Page, email: str) -> None:
-    """
-    Set the output options for the data retrieval, including the format and email.
-    :param email: The email address to send the report to.
-    """
-    page.get_by_text("Excel spreadsheet (*.xlsx)").click()
-    email_box = page.get_by_role("textbox", name="E-Mail Address (Optional)")
-    email_box.fill(email)
-
-def perform_query_and_download(page: Page) -> None:
-    """
-    Submit the form, wait for the query to complete, and download the result.
-    """
-    with page.expect_popup() as page_info:
-        page.get_by_role("button", name="Submit Form").click()
-    query_page = page_info.value
-    
-    # Validate correct navigation
-    query_page.goto("https://wrds-www.wharton.upenn.edu/query-manager/query/9587217/")
-
-    with query_page.expect_download() as download_info:
-        query_page.get_by_role("link", name="Download .xlsx Output").click()
-    download = download_info.value
-    # Download path could be used here if needed:
-    # download.save_as(<desired_path>)
-
-Please use the following format to select an action from either the standard action space or the workflow action space:
-- For standard actions: STANDARD.<action_name>(<args>)  e.g., STANDARD.click(bid='123')
-- For workflow actions: WORKFLOW.<action_name>(<args>) e.g., WORKFLOW.open_page(url='https://example.com')    
-
-Please also prepend your action choice with chain-of-thought reasoning and wrap your action choice in triple backticks on a newline like these examples:
-
-I now need to click on the Submit button to send the form. I will use the click action on the button, which has bid 12.
-```STANDARD.click("12")```
-
-I found the information requested by the user, I will send it to the chat.
-```STANDARD.send_msg_to_user("The price for a 15\\" laptop is 1499 USD.")```
-
-I see date input fields in the query build form and it looks the set_date_range function in our workflow libary was written for this so I'll just use that directly.
-```WORKFLOW.set_date_range(start_date='2020-01', end_date='2024-12')```
-        '''
-        user_msgs.append(
-            {
-                "type": "text",
-                "text": f"{action_space_raw}".format(
-                    action_space_description=self.action_set.describe(with_long_description=False, with_examples=True)
-                )
-            }
-        )
+                },
+            ], priority=60))
 
         # append past actions (and last error message) if any
-        if self.action_history:
-            user_msgs.append(
+        if self.history:
+            # the oldest actions go first if the prompt is over budget
+            sections.append(PromptSection("history", [
                 {
                     "type": "text",
                     "text": f"""\
 # History of past actions
 """,
                 }
-            )
-            user_msgs.extend(
-                [
-                    {
-                        "type": "text",
-                        "text": f"""\
-
-{action}
-""",
-                    }
-                    for action in self.action_history
-                ]
-            )
+            ] + self.history.render(), priority=10, trim=trim_oldest_first))
 
             if obs["last_action_error"]:
-                user_msgs.append(
+                sections.append(PromptSection("last_action_error", [
                     {
                         "type": "text",
                         "text": f"""\
@@ -350,10 +354,10 @@ I see date input fields in the query build form and it looks the set_date_range
 
 """,
                     }
-                )
+                ], priority=70, trim=trim_tail))
 
         # ask for the next action
-        user_msgs.append(
+        sections.append(PromptSection("next_action", [
             {
                 "type": "text",
                 "text": f"""\
@@ -362,10 +366,12 @@ I see date input fields in the query build form and it looks the set_date_range
 You will now think step by step and produce your next best action. Reflect on your past actions, any resulting error message, and the current state of the page before deciding on your next action.
 """,
             }
-        )
+        ], priority=100))
+
+        prompt = self.prompt_assembler.assemble(sections)
 
         prompt_text_strings = []
-        for message in system_msgs + user_msgs:
+        for message in prompt.system_msgs + prompt.user_msgs:
             match message["type"]:
                 case "text":
                     prompt_text_strings.append(message["text"])
@@ -385,20 +391,118 @@ You will now think step by step and produce your next best action. Reflect on yo
                     )
         full_prompt_txt = "\n".join(prompt_text_strings)
         logger.info(full_prompt_txt)
+        return prompt
+
+    @staticmethod
+    def messages(prompt: AssembledPrompt) -> list[dict]:
+        return [
+            {"role": "system", "content": prompt.system_msgs},
+            {"role": "user", "content": prompt.user_msgs},
+        ]
+
+    def replay_action(self, obs: dict) -> Optional[tuple[str, dict]]:
+        """The next step of a demonstrated workflow, while replay is on and the page still matches it"""
+        if not self.replay:
+            return None
+        step_start = time.perf_counter()
+        url, _, goal = self.page_context(obs)
+        if self.replay_engine is None and not self.history:
+            # the demonstration to replay is chosen once, on the first step
+            self.replay_engine = ReplayEngine.select(self.workflow_space.registry, goal, url, session_id=self.replay_session)
+        if self.replay_engine is None:
+            return None
+        action = self.replay_engine.next_action(url, obs["axtree_txt"] if self.use_axtree else None, obs["last_action_error"])
+        if action is None:
+            return None
+        self.history.set_last_outcome(obs["last_action_error"])
+        self.history.append(action)
+        if self.axtree_differ:
+            # the model's first step after the replay gets the full tree
+            self.axtree_differ.reset()
+        stats = {"replayed_step": self.replay_engine.position, "step_seconds": time.perf_counter() - step_start}
+        logger.info("Step stats: %s", stats)
+        return action, {"stats": stats}
+
+    def cached_action(self, obs: dict) -> Optional[tuple[str, dict]]:
+        """A previous decision of the model on a structurally identical page state, if trusted enough"""
+        self._decision_key = None
+        if self.decision_cache is None:
+            return None
+        step_start = time.perf_counter()
+        self.decision_cache.record_outcome(obs["last_action_error"])
+        url, _, goal = self.page_context(obs)
+        last_action = self.history.entries[-1].action if self.history else ""
+        key = fingerprint(goal, url, obs["axtree_txt"], last_action)
+        hit = self.decision_cache.lookup(key, obs["axtree_txt"])
+        if hit is None:
+            # the model's answer is cached under this key in finish_step
+            self._decision_key = key
+            return None
+        action, confidence = hit
+        self.history.set_last_outcome(obs["last_action_error"])
+        self.history.append(action)
+        if self.axtree_differ:
+            self.axtree_differ.reset()
+        stats = {
+            "cached_decision_confidence": confidence,
+            "decision_cache_hits": self.decision_cache.hits,
+            "decision_cache_misses": self.decision_cache.misses,
+            "step_seconds": time.perf_counter() - step_start,
+        }
+        logger.info("Step stats: %s", stats)
+        return action, {"stats": stats}
+
+    def get_action(self, obs: dict) -> tuple[str, dict]:
+        replayed = self.replay_action(obs) or self.cached_action(obs)
+        if replayed:
+            return replayed
+        step_start = time.perf_counter()
+        prompt = self.build_prompt(obs)
 
         # query OpenAI model
+        prompt_seconds = time.perf_counter() - step_start
+        llm_start = time.perf_counter()
         response = self.openai_client.chat.completions.create(
             model=self.model_name,
-            messages=[
-                {"role": "system", "content": system_msgs},
-                {"role": "user", "content": user_msgs},
-            ],
+            messages=self.messages(prompt),
         )
-        action = response.choices[0].message.content
+        llm_seconds = time.perf_counter() - llm_start
+        return self.finish_step(obs, prompt, response, step_start, prompt_seconds, llm_seconds)
 
-        self.action_history.append(action)
+    def finish_step(self, obs: dict, prompt: AssembledPrompt, response, step_start: float, prompt_seconds: float, llm_seconds: float) -> tuple[str, dict]:
+        """Record the model's answer in the history and report the step's stats"""
+        action = response.choices[0].message.content
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        if prompt_tokens:
+            self.prompt_tokens_total += prompt_tokens
+            self.cached_tokens_total += cached_tokens or 0
+
+        self.history.append(action)
+        if self._decision_key:
+            self.decision_cache.expect(self._decision_key, action, obs["axtree_txt"])
+
+        # view timings are only known for LazyObservations, i.e. when obs_preprocessor ran
+        view_seconds = dict(getattr(obs, "timings", {}))
+        stats = {
+            "prompt_seconds": prompt_seconds,
+            "llm_seconds": llm_seconds,
+            "step_seconds": time.perf_counter() - step_start,
+            "prompt_tokens": prompt_tokens if prompt_tokens is not None else float("nan"),
+            "cached_prompt_tokens": cached_tokens if cached_tokens is not None else float("nan"),
+            "static_prompt_tokens": prompt.section_tokens["static"],
+            # share of all prompt tokens so far that were served from the provider's cache
+            "prompt_cache_hit_rate": self.cached_tokens_total / self.prompt_tokens_total if self.prompt_tokens_total else float("nan"),
+            "prompt_tokens_estimate": prompt.tokens,
+            # BrowserGym aggregates step stats with np.nansum/np.nanmax, so they must all be scalars
+            "trimmed_tokens": sum(prompt.trimmed.values()),
+            **{f"trimmed_{section}_tokens": tokens for section, tokens in prompt.trimmed.items()},
+            **{f"obs_{view}_seconds": seconds for view, seconds in view_seconds.items()},
+        }
+        logger.info("Step stats: %s", stats)
 
-        return action, {}
+        return action, {"stats": stats}
 
 
 @dataclasses.dataclass
@@ -416,13 +520,33 @@ class DemoAgentArgs(AbstractAgentArgs):
     use_html: bool = False
     use_axtree: bool = True
     use_screenshot: bool = False
+    use_axtree_diff: bool = False
+    max_prompt_tokens: Optional[int] = None
+    history_keep_recent: int = 5
+    summarize_history: bool = False
+    workflow_top_k: int = 8
+    workflow_max_tokens: int = 2000
+    replay: bool = False
+    replay_session: Optional[str] = None
+    decision_cache_path: Optional[str] = None
+
+    agent_class: ClassVar[type] = DemoAgent
 
     def make_agent(self):
-        return DemoAgent(
+        return self.agent_class(
             model_name=self.model_name,
             chat_mode=self.chat_mode,
             demo_mode=self.demo_mode,
             use_html=self.use_html,
             use_axtree=self.use_axtree,
             use_screenshot=self.use_screenshot,
+            use_axtree_diff=self.use_axtree_diff,
+            max_prompt_tokens=self.max_prompt_tokens,
+            history_keep_recent=self.history_keep_recent,
+            summarize_history=self.summarize_history,
+            workflow_top_k=self.workflow_top_k,
+            workflow_max_tokens=self.workflow_max_tokens,
+            replay=self.replay,
+            replay_session=self.replay_session,
+            decision_cache_path=self.decision_cache_path,
         )
@@ -0,0 +1,139 @@
+import asyncio
+import dataclasses
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import ClassVar, List, Optional
+import openai
+
+from src.agents.browser_gym.agent import DemoAgent, DemoAgentArgs
+
+logger = logging.getLogger(__name__)
+
+
+def _release(executor: ThreadPoolExecutor, async_client, loop: asyncio.AbstractEventLoop, loop_thread: threading.Thread, decision_cache):
+    """Stop the agent's threads and close its clients; holds no reference to the agent so it can finalize it"""
+    executor.shutdown(wait=False, cancel_futures=True)
+    if loop.is_running():
+        # called from the loop's own thread, e.g. by a collection there, it can only be told to stop
+        if threading.current_thread() is not loop_thread:
+            try:
+                asyncio.run_coroutine_threadsafe(async_client.close(), loop).result(timeout=5)
+            except Exception as e:
+                logger.warning("Closing the async client failed: %s", e)
+        loop.call_soon_threadsafe(loop.stop)
+        if threading.current_thread() is not loop_thread:
+            loop_thread.join(timeout=5)
+    if not loop.is_running():
+        loop.close()
+    if decision_cache:
+        decision_cache.close()
+
+
+class AsyncDemoAgent(DemoAgent):
+    """DemoAgent that keeps preprocessing, the model and the browser busy at the same time.
+
+    - The observation's views (AXTree, DOM) are started on the executor as soon as it arrives.
+    - The model is called with AsyncOpenAI on the agent's own event loop. While it thinks,
+      if the last action was a learned workflow, the workflow section of the step after the
+      demonstrated next workflow is prepared, betting that the model follows the demonstration
+      (`prediction_hits`/`prediction_misses` count how often it does).
+    - Once the action is chosen, the next step's workflow section (retrieval call included)
+      is prepared in the background while the browser executes the action.
+
+    Only the workflow section is prepared ahead; the rest of the next prompt needs the
+    next observation and is built when it arrives.
+
+    A prepared section is used only if the next page has the title it was retrieved with;
+    `speculation_hits`/`speculation_misses` count steps that could and couldn't use one.
+
+    The per-step latency the episode sees is then close to the model time alone.
+
+    BrowserGym never closes agents, so the event loop thread, executor and clients are
+    released by a finalizer when the episode drops the agent (or at exit), or by close().
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.async_client = openai.AsyncOpenAI()
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._loop_thread.start()
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self._speculations: List[Future] = []
+        self._finalizer = weakref.finalize(
+            self, _release, self.executor, self.async_client, self.loop, self._loop_thread, self.decision_cache
+        )
+        self.prediction_hits = 0
+        self.prediction_misses = 0
+
+    def obs_preprocessor(self, obs: dict) -> dict:
+        observation = super().obs_preprocessor(obs)
+        observation.prefetch(self.executor)
+        return observation
+
+    def _speculate(self, obs: dict, last_workflow: Optional[str]):
+        """Render the workflow section the next step will need if `last_workflow` is what runs now"""
+        # the next page's title is unknown yet: guess the current one, the render is only used if it matches
+        self._speculations.append(self.executor.submit(self.workflow_space.render, *self.page_context(obs), last_workflow, speculative=True))
+
+    def _wait_for_speculations(self):
+        # speculative renders fill the same cache build_prompt reads
+        for speculation in self._speculations:
+            try:
+                speculation.result()
+            except Exception as e:
+                logger.warning("Speculative prompt preparation failed: %s", e)
+        self._speculations = []
+
+    def get_action(self, obs: dict) -> tuple[str, dict]:
+        replayed = self.replay_action(obs) or self.cached_action(obs)
+        if replayed:
+            return replayed
+        step_start = time.perf_counter()
+        self._wait_for_speculations()
+        prompt = self.build_prompt(obs)
+
+        # query OpenAI model
+        prompt_seconds = time.perf_counter() - step_start
+        llm_start = time.perf_counter()
+        request = asyncio.run_coroutine_threadsafe(
+            self.async_client.chat.completions.create(model=self.model_name, messages=self.messages(prompt)),
+            self.loop,
+        )
+        last_workflow = self.history.last_workflow()
+        next_steps = self.workflow_space.registry.next_steps(last_workflow) if last_workflow else []
+        predicted = next_steps[0].split("(", 1)[0] if next_steps else None
+        if predicted:
+            self._speculate(obs, predicted)
+        response = request.result()
+        llm_seconds = time.perf_counter() - llm_start
+
+        action, info = self.finish_step(obs, prompt, response, step_start, prompt_seconds, llm_seconds)
+
+        chosen = self.history.last_workflow()
+        if predicted:
+            if chosen == predicted:
+                self.prediction_hits += 1
+            else:
+                self.prediction_misses += 1
+        if chosen != predicted:
+            # prepare the next step while the browser runs this action
+            self._speculate(obs, chosen)
+        info["stats"]["prediction_hits"] = self.prediction_hits
+        info["stats"]["prediction_misses"] = self.prediction_misses
+        info["stats"]["speculation_hits"] = self.workflow_space.speculation_hits
+        info["stats"]["speculation_misses"] = self.workflow_space.speculation_misses
+        return action, info
+
+    def close(self):
+        self._wait_for_speculations()
+        self._finalizer()
+        self.history.close()
+
+
+@dataclasses.dataclass
+class AsyncDemoAgentArgs(DemoAgentArgs):
+    """DemoAgentArgs for the AsyncDemoAgent"""
+    agent_class: ClassVar[type] = AsyncDemoAgent
@@ -0,0 +1,114 @@
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
+from dataclasses import dataclass
+from urllib.parse import urldefrag
+import re
+
+_NODE = re.compile(r'^\[(?P<bid>[^\]]+)\]\s*(?P<content>.*)$')
+
+
+@dataclass
+class AXNode:
+    key: str
+    bid: Optional[str]
+    content: str
+    depth: int
+    parent: Optional[str]
+    parent_bid: Optional[str]
+
+    @property
+    def role(self) -> str:
+        return self.content.split(" ", 1)[0] if self.content else ""
+
+
+def index_axtree(axtree_txt: str) -> Dict[str, AXNode]:
+    """Index a flattened AXTree by bid, in document order.
+
+    Nodes without a bid are keyed by their parent and content so repeated
+    unlabeled nodes stay distinguishable.
+    """
+    nodes: Dict[str, AXNode] = {}
+    stack: List[Tuple[int, str]] = []
+    occurrences: Counter = Counter()
+    for line in axtree_txt.splitlines():
+        stripped = line.lstrip()
+        if not stripped:
+            continue
+        depth = len(line) - len(stripped)
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        parent = stack[-1][1] if stack else None
+        match = _NODE.match(stripped)
+        if match:
+            bid, content = match.group("bid"), match.group("content")
+            key = bid
+        else:
+            bid, content = None, stripped
+            occurrences[(parent, content)] += 1
+            key = f"{parent}>{content}#{occurrences[(parent, content)]}"
+        parent_bid = nodes[parent].bid if parent else None
+        nodes[key] = AXNode(key=key, bid=bid, content=content, depth=depth, parent=parent, parent_bid=parent_bid)
+        stack.append((depth, key))
+    return nodes
+
+
+class AXTreeDiffer:
+    """Renders the AXTree of each step as a compact diff against the previous step.
+
+    The previous tree is kept indexed by bid. Each step emits the added, removed
+    and changed nodes plus a short summary of the page. The full tree is sent
+    instead on the first step, after a navigation (URL change, ignoring the
+    fragment), when the previous action errored, and whenever the diff would be
+    larger than `max_diff_ratio` of the full tree.
+    """
+    def __init__(self, max_diff_ratio: float = 0.5):
+        self.max_diff_ratio = max_diff_ratio
+        self._nodes: Optional[Dict[str, AXNode]] = None
+        self._url: Optional[str] = None
+
+    def reset(self):
+        self._nodes, self._url = None, None
+
+    @staticmethod
+    def summary(nodes: Dict[str, AXNode], url: str) -> str:
+        roles = Counter(node.role for node in nodes.values())
+        top_roles = ", ".join(f"{count} {role}" for role, count in sorted(roles.items(), key=lambda item: (-item[1], item[0]))[:8])
+        return f"Page {url}: {len(nodes)} nodes ({top_roles})"
+
+    @staticmethod
+    def _line(node: AXNode) -> str:
+        label = f"[{node.bid}] {node.content}" if node.bid else node.content
+        parent = f" (in [{node.parent_bid}])" if node.parent_bid else ""
+        return f"{label}{parent}"
+
+    def render(self, axtree_txt: str, url: str, force_full: bool = False) -> Tuple[str, bool]:
+        """Return (text to put in the prompt, whether it's the full tree) and remember this step's tree"""
+        url = urldefrag(url)[0]
+        nodes = index_axtree(axtree_txt)
+        previous, previous_url = self._nodes, self._url
+        self._nodes, self._url = nodes, url
+
+        if force_full or previous is None or url != previous_url:
+            return axtree_txt, True
+
+        added = [node for key, node in nodes.items() if key not in previous]
+        removed = [node for key, node in previous.items() if key not in nodes]
+        changed = [(previous[key], node) for key, node in nodes.items() if key in previous and previous[key].content != node.content]
+
+        lines = [self.summary(nodes, url), f"{len(nodes) - len(added) - len(changed)} nodes unchanged since the last step."]
+        if added:
+            lines.append(f"Added ({len(added)}):")
+            lines.extend(f"+ {self._line(node)}" for node in added)
+        if removed:
+            lines.append(f"Removed ({len(removed)}):")
+            lines.extend(f"- {self._line(node)}" for node in removed)
+        if changed:
+            lines.append(f"Changed ({len(changed)}):")
+            lines.extend(f"~ {self._line(node)}  (was: {before.content})" for before, node in changed)
+        if not (added or removed or changed):
+            lines.append("The page did not change.")
+        diff = "\n".join(lines)
+
+        if len(diff) > self.max_diff_ratio * len(axtree_txt):
+            return axtree_txt, True
+        return diff, False
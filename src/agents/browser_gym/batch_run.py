@@ -0,0 +1,163 @@
+import argparse
+import csv
+import dataclasses
+import itertools
+import json
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# locally defined agent
+from agent import DemoAgentArgs
+
+# browsergym experiments utils
+from browsergym.experiments import ExpArgs, get_exp_result
+
+from custom_action_mapping import CustomActionEnvArgs
+from run import str2bool
+
+# observation flag sets of the grid, by name
+OBS_FLAGS = {
+    "axtree": {"use_axtree": True, "use_html": False, "use_screenshot": False},
+    "html": {"use_axtree": False, "use_html": True, "use_screenshot": False},
+    "axtree+html": {"use_axtree": True, "use_html": True, "use_screenshot": False},
+    "axtree+screenshot": {"use_axtree": True, "use_html": False, "use_screenshot": True},
+}
+
+SUMMARY_COLUMNS = ["episode", "status", "cum_reward", "n_steps", "terminated", "truncated", "seconds", "err_msg"]
+
+
+@dataclasses.dataclass
+class Episode:
+    task_name: str
+    model_name: str
+    obs: str
+
+    @property
+    def id(self) -> str:
+        return f"{self.task_name}__{self.model_name}__{self.obs}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a grid of BrowserGym episodes in parallel headless browsers.")
+    parser.add_argument("--tasks", type=str, nargs="*", default=[], help="Task names, e.g. miniwob.click-test.")
+    parser.add_argument("--tasks_file", type=str, default=None, help="File with one task name per line.")
+    parser.add_argument("--models", type=str, nargs="+", default=["gpt-4o-mini"], help="Models to run every task with.")
+    parser.add_argument("--obs", type=str, nargs="+", default=["axtree"], choices=list(OBS_FLAGS), help="Observation flag sets to run every task with.")
+    parser.add_argument("--max_workers", type=int, default=4, help="Number of episodes (browsers) running at once.")
+    parser.add_argument("--max_steps", type=int, default=100, help="Maximum number of steps per episode.")
+    parser.add_argument("--results_dir", type=str, default="src/agents/browser_gym/results/batch", help="Where episodes, the resume manifest and the summary go.")
+    parser.add_argument("--storage_state", type=str, default=None, help="Playwright storage state (auth.json) to start every episode with.")
+    parser.add_argument("--browser_pool", type=str2bool, default=True, help="Reuse each worker's warm browsers across its episodes instead of launching new ones at every reset.")
+    parser.add_argument("--retry_failed", type=str2bool, default=False, help="Also rerun episodes that failed in a previous run.")
+    return parser.parse_args()
+
+
+def load_manifest(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_manifest(path: Path, manifest: dict):
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(path)
+
+
+def run_episode(episode: Episode, results_dir: str, max_steps: int, storage_state: str, browser_pool: bool = True) -> dict:
+    """Run one episode in a headless browser (in a worker process), returning its experiment directory and duration"""
+    start = time.perf_counter()
+    agent_args = DemoAgentArgs(model_name=episode.model_name, **OBS_FLAGS[episode.obs])
+    env_args = CustomActionEnvArgs(
+        task_name=episode.task_name,
+        task_seed=None,
+        max_steps=max_steps,
+        headless=True,
+        storage_state=storage_state,
+        use_browser_pool=browser_pool,
+    )
+    exp_args = ExpArgs(env_args=env_args, agent_args=agent_args)
+    exp_args.prepare(results_dir)
+    exp_args.run()
+    return {"exp_dir": str(exp_args.exp_dir), "seconds": round(time.perf_counter() - start, 1)}
+
+
+def summarize(manifest: dict, results_dir: Path):
+    """Collect the exp records of every episode into summary.csv and print the main columns"""
+    rows = []
+    for episode_id, entry in sorted(manifest.items()):
+        row = {"episode": episode_id, "status": entry["status"], "seconds": entry.get("seconds", "")}
+        if entry["status"] == "done":
+            try:
+                row.update(get_exp_result(entry["exp_dir"]).get_exp_record())
+            except Exception as e:
+                row["err_msg"] = f"Could not load results: {e}"
+        else:
+            row["err_msg"] = entry.get("error", "")
+        rows.append(row)
+
+    columns = SUMMARY_COLUMNS + sorted({key for row in rows for key in row} - set(SUMMARY_COLUMNS))
+    with open(results_dir / "summary.csv", 'w', newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    widths = {column: max([len(column)] + [len(str(row.get(column, ""))[:60]) for row in rows]) for column in SUMMARY_COLUMNS}
+    print("  ".join(column.ljust(widths[column]) for column in SUMMARY_COLUMNS))
+    for row in rows:
+        print("  ".join(str(row.get(column, ""))[:60].ljust(widths[column]) for column in SUMMARY_COLUMNS))
+    rewards = [row["cum_reward"] for row in rows if isinstance(row.get("cum_reward"), (int, float))]
+    if rewards:
+        print(f"\n{len(rewards)}/{len(rows)} episodes finished, mean reward {sum(rewards) / len(rewards):.3f}")
+    print(f"Summary written to {results_dir / 'summary.csv'}")
+
+
+def main():
+    """Script to run a task x model x observation grid across a process pool, resumable after a crash."""
+    args = parse_args()
+    tasks = list(args.tasks)
+    if args.tasks_file:
+        with open(args.tasks_file, 'r') as f:
+            tasks.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not tasks:
+        raise ValueError("No tasks given, pass --tasks or --tasks_file.")
+
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = results_dir / "batch_manifest.json"
+    manifest = load_manifest(manifest_path)
+
+    episodes = [Episode(task, model, obs) for task, model, obs in itertools.product(tasks, args.models, args.obs)]
+    skip = {"done", "failed"} if not args.retry_failed else {"done"}
+    pending = [episode for episode in episodes if manifest.get(episode.id, {}).get("status") not in skip]
+    print(f"{len(episodes)} episodes, {len(episodes) - len(pending)} already run, {len(pending)} to run with {args.max_workers} workers")
+
+    # spawn: each worker gets a clean interpreter for its own Playwright instance
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.max_workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(run_episode, episode, str(results_dir), args.max_steps, args.storage_state, args.browser_pool): episode
+            for episode in pending
+        }
+        for future in as_completed(futures):
+            episode = futures[future]
+            try:
+                entry = {"status": "done", **future.result()}
+            except Exception as e:
+                entry = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+                traceback.print_exception(e)
+            manifest[episode.id] = entry
+            # saved after every episode so a crashed batch resumes where it stopped
+            save_manifest(manifest_path, manifest)
+            print(f"[{sum(1 for e in manifest.values() if e['status'] == 'done')}/{len(episodes)}] {episode.id}: {entry['status']}")
+
+    summarize({episode.id: manifest[episode.id] for episode in episodes if episode.id in manifest}, results_dir)
+
+
+if __name__ == "__main__":
+    main()
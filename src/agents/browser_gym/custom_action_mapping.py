@@ -1,89 +1,87 @@
-from src.agents.browser_gym.action_library import (
-    navigate_to_data_source,
-    set_date_range,
-    enter_ticker,
-    add_variables,
-    set_output_options,
-    perform_query_and_download,
-)
+import atexit
+import dataclasses
+from functools import lru_cache
+from pathlib import Path
 
 from browsergym.core.action.highlevel import HighLevelActionSet
+from browsergym.experiments import EnvArgs
+
+from src.agents.browser_gym.workflow_registry import WorkflowRegistry
+from src.services.browser_pool import BrowserPool
+
+STANDARD_PREFIX = "STANDARD."
+WORKFLOW_PREFIX = "WORKFLOW."
+
+@lru_cache(maxsize=1)
+def get_standard_action_set() -> HighLevelActionSet:
+    return HighLevelActionSet()
+
+@lru_cache(maxsize=1)
+def get_workflow_registry() -> WorkflowRegistry:
+    """Registry of every learned workflow, built once per process"""
+    return WorkflowRegistry.build()
+
+@lru_cache(maxsize=1)
+def get_browser_pool() -> BrowserPool:
+    """Browser pool serving every BrowserGym environment of the process, closed at exit"""
+    pool = BrowserPool().install_for_browsergym()
+    atexit.register(pool.close)
+    return pool
+
+def extract_action(action_str: str) -> str:
+    """Extract the action from within triple backticks"""
+    start = action_str.find("```")
+    end = action_str.find("```", start + 3) if start != -1 else -1
+    if end == -1:
+        raise ValueError("No action found within triple backticks")
+    return action_str[start + 3:end].strip()
 
 def custom_action_mapping(action_str: str) -> str:
     """
-    An extension of browser gym default action space that allows us to execute learned workflows
-    TODO: this function will have to support all functions that we ever learn from demonstration, right now we've hardcoded actions from one demo
+    An extension of browser gym default action space that allows us to execute learned workflows.
+    WORKFLOW actions are routed through the WorkflowRegistry built from the ingested workflow libraries.
     """
-    # extract the action from within triple backticks
-    import re
-    match = re.search(r'```(.+?)```', action_str, re.DOTALL)
-    if not match:
-        raise ValueError("No action found within triple backticks")
-    
-    action_str = match.group(1).strip()
+    action_str = extract_action(action_str)
     print(f"Extracted action: {action_str}")
-    
-    if action_str.startswith("STANDARD."):
+
+    if action_str.startswith(STANDARD_PREFIX):
         # Handle standard BrowserGym actions
-        action_part = action_str[len("STANDARD."):]
+        action_part = action_str[len(STANDARD_PREFIX):]
         try:
-            action_code = HighLevelActionSet().to_python_code(action_part)
-            return action_code
+            return get_standard_action_set().to_python_code(action_part)
         except Exception as e:
             raise ValueError(f"Error parsing STANDARD action '{action_part}': {e}")
-    
-    elif action_str.startswith("WORKFLOW."):
-        # Handle custom workflow actions
-        action_part = action_str[len("WORKFLOW."):]
-        
-        # Split on first occurrence of '('
-        if '(' not in action_part:
-            raise ValueError(f"Invalid WORKFLOW action format: '{action_str}'. Must include parentheses.")
-            
-        workflow_name, args_str = action_part.split('(', 1)
-        args_str = args_str.rstrip(')')  # Remove closing parenthesis
-        workflow_name = workflow_name.strip()
-        
+
+    elif action_str.startswith(WORKFLOW_PREFIX):
+        # Handle learned workflow actions
+        action_part = action_str[len(WORKFLOW_PREFIX):]
         try:
-            if workflow_name == "add_variables":
-                # Extract the list directly using regex
-                variables_match = re.search(r'variables=\[(.*?)\]', args_str)
-                if not variables_match:
-                    raise ValueError("Could not parse variables list")
-                # Split the comma-separated values and clean them
-                variables = [v.strip().strip("'").strip('"') for v in variables_match.group(1).split(',')]
-                return add_variables(variables=variables)
-            
-            # Regular argument parsing for other functions
-            kwargs = {}
-            if args_str.strip():
-                for arg_pair in args_str.split(','):
-                    if '=' in arg_pair:
-                        key, value = arg_pair.strip().split('=', 1)
-                        kwargs[key.strip()] = value.strip().strip("'").strip('"')
-            
-            # Map to appropriate workflow function
-            if workflow_name == "navigate_to_data_source":
-                return navigate_to_data_source()
-            elif workflow_name == "set_date_range":
-                if 'start_date' not in kwargs or 'end_date' not in kwargs:
-                    raise ValueError("set_date_range requires start_date and end_date")
-                return set_date_range(start_date=kwargs['start_date'], end_date=kwargs['end_date'])
-            elif workflow_name == "enter_ticker":
-                if 'ticker' not in kwargs:
-                    raise ValueError("enter_ticker requires ticker")
-                return enter_ticker(ticker=kwargs['ticker'])
-            elif workflow_name == "set_output_options":
-                if 'email' not in kwargs:
-                    raise ValueError("set_output_options requires email")
-                return set_output_options(email=kwargs['email'])
-            elif workflow_name == "perform_query_and_download":
-                return perform_query_and_download()
-            else:
-                raise ValueError(f"Unknown workflow action: {workflow_name}")
-                
+            return get_workflow_registry().to_python_code(action_part)
         except Exception as e:
             raise ValueError(f"Error parsing WORKFLOW action '{action_part}': {e}")
-    
+
     else:
-        raise ValueError(f"Unknown action type. Must start with 'STANDARD.' or 'WORKFLOW.'")
\ No newline at end of file
+        raise ValueError(f"Unknown action type. Must start with 'STANDARD.' or 'WORKFLOW.'")
+
+
+@dataclasses.dataclass
+class CustomActionEnvArgs(EnvArgs):
+    """
+    EnvArgs whose environments execute actions through custom_action_mapping.
+    The mapping is a module-level function, so these args pickle into worker processes
+    and concurrent episodes need no patching of ExpArgs.
+
+    With `use_browser_pool`, the environment's browsers come from the process's warm
+    BrowserPool instead of being launched at every reset, and the storage state file is
+    read once per process.
+    """
+    use_browser_pool: bool = False
+
+    def make_env(self, *args, **kwargs):
+        kwargs['action_mapping'] = custom_action_mapping
+        env_args = self
+        if self.use_browser_pool:
+            pool = get_browser_pool()
+            if isinstance(self.storage_state, (str, Path)):
+                env_args = dataclasses.replace(self, storage_state=pool.storage_state(self.storage_state))
+        return super(CustomActionEnvArgs, env_args).make_env(*args, **kwargs)
\ No newline at end of file
@@ -0,0 +1,177 @@
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+import hashlib
+import json
+import logging
+import re
+import time
+
+from src.agents.browser_gym.utils import axtree_pattern
+from src.utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+# roles whose names identify what the page offers; other text (cells, paragraphs) is wildcarded
+INTERACTIVE_ROLES = {
+    "button", "link", "textbox", "searchbox", "combobox", "checkbox", "radio", "tab", "menuitem",
+    "option", "listbox", "switch", "slider", "spinbutton", "heading", "dialog", "RootWebArea",
+}
+
+_BID_LINE = re.compile(r'^\s*\[(?P<bid>[^\]]+)\]')
+# element id arguments of BrowserGym actions: the first argument of the element actions, both of drag_and_drop
+_BID_ACTIONS = r'(?:click|dblclick|hover|fill|select_option|press|focus|clear|upload_file|drag_and_drop)'
+_QUOTED = r'(?P<quote{0}>["\'])(?P<bid{0}>[^"\'\\]+)(?P=quote{0})'
+_BID_ARGUMENTS = re.compile(
+    rf'\b(?P<action>{_BID_ACTIONS})\(\s*{_QUOTED.format(1)}(?:\s*,\s*{_QUOTED.format(2)})?'
+)
+_ID_SEGMENT = re.compile(r'^(?:\d+|[0-9a-fA-F-]{8,})$')
+
+
+def url_pattern(url: str) -> str:
+    """Host and path with id-like segments wildcarded, plus the sorted query keys"""
+    parts = urlsplit(url)
+    path = "/".join("*" if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split("/"))
+    keys = sorted({key for key, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    return f"{parts.netloc}{path}?{'&'.join(keys)}"
+
+
+def axtree_skeleton(axtree_txt: str) -> List[str]:
+    """The tree's structure: indent and role of every line, with names kept only for interactive roles"""
+    skeleton = []
+    for line in axtree_txt.splitlines():
+        if not line.strip():
+            continue
+        role, _ = axtree_pattern(line)
+        indent = len(line) - len(line.lstrip())
+        pattern = axtree_pattern(line, wildcard_text=role not in INTERACTIVE_ROLES)[1]
+        skeleton.append(f"{indent}:{pattern}")
+    return skeleton
+
+
+def fingerprint(goal: str, url: str, axtree_txt: str, last_action: str) -> str:
+    """Cache key of a decision: hash of the goal, URL pattern, AXTree skeleton and last action (numbers wildcarded)"""
+    digest = hashlib.sha256()
+    for part in (" ".join(goal.split()), url_pattern(url), "\n".join(axtree_skeleton(axtree_txt)), re.sub(r'\d+', '#', last_action)):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _bid_arguments(answer: str) -> List[Tuple[int, int, str]]:
+    """(start, end, bid) of every element id an action in the answer targets, not other quoted literals"""
+    spans = []
+    for match in _BID_ARGUMENTS.finditer(answer):
+        spans.append((match.start("bid1"), match.end("bid1"), match.group("bid1")))
+        if match.group("action") == "drag_and_drop" and match.group("bid2"):
+            spans.append((match.start("bid2"), match.end("bid2"), match.group("bid2")))
+    return spans
+
+
+def _element_index(axtree_txt: str) -> Tuple[Dict[str, Tuple[str, int]], Dict[Tuple[str, int], str]]:
+    """bid -> (line pattern, occurrence of that pattern) and its inverse, to carry bids across page loads"""
+    by_bid, by_pattern = {}, {}
+    occurrences: Dict[str, int] = {}
+    for line in axtree_txt.splitlines():
+        match = _BID_LINE.match(line)
+        if not match:
+            continue
+        pattern = axtree_pattern(line, wildcard_text=False)[1]
+        occurrence = occurrences.get(pattern, 0)
+        occurrences[pattern] = occurrence + 1
+        by_bid[match.group("bid")] = (pattern, occurrence)
+        by_pattern[(pattern, occurrence)] = match.group("bid")
+    return by_bid, by_pattern
+
+
+def _canonical_answer(answer: str, targets: Dict[str, Tuple[str, int]]) -> str:
+    """The answer with element ids replaced by the elements they target, equal for the same decision on any page load"""
+    for start, end, bid in reversed(_bid_arguments(answer)):
+        if bid in targets:
+            pattern, occurrence = targets[bid]
+            answer = answer[:start] + f"{pattern}#{occurrence}" + answer[end:]
+    return answer
+
+
+class DecisionCache:
+    """Persistent cache of the model's decisions, keyed on a structural fingerprint of the page state.
+
+    A decision is stored once it succeeded, i.e. the next observation had no
+    `last_action_error`. It is reused once it succeeded `min_successes` times (the
+    model chose it again on the same state) and its confidence, the Laplace-smoothed
+    success rate, is at least `min_confidence`. Element ids in the cached answer
+    are remapped to the elements with the same role, name and position on the
+    current page; if one can't be found the entry isn't used. A reused decision
+    that errors loses confidence and is deleted once it falls below the threshold.
+    Storage is a size-bounded LRU DiskCache.
+    """
+    def __init__(self, path: str, min_confidence: float = 0.6, min_successes: int = 2, max_bytes: int = 64 * 1024 * 1024):
+        self.disk = DiskCache(path, max_bytes=max_bytes)
+        self.min_confidence = min_confidence
+        self.min_successes = min_successes
+        # (key, entry) of the last decision, waiting for its outcome
+        self._pending: Optional[Tuple[str, dict]] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def confidence(entry: dict) -> float:
+        return (entry["successes"] + 1) / (entry["successes"] + entry["failures"] + 2)
+
+    def trusted(self, entry: dict) -> bool:
+        """Whether a decision succeeded often enough to be reused without asking the model"""
+        return entry["successes"] >= self.min_successes and self.confidence(entry) >= self.min_confidence
+
+    def record_outcome(self, last_action_error: str):
+        """Score the pending decision with the outcome the new observation reports"""
+        if self._pending is None:
+            return
+        key, entry = self._pending
+        self._pending = None
+        if last_action_error:
+            entry["failures"] += 1
+        else:
+            entry["successes"] += 1
+        if entry["successes"] and self.confidence(entry) >= self.min_confidence:
+            self.disk.put(key, json.dumps(entry).encode())
+        else:
+            self.disk.delete(key)
+            if last_action_error:
+                logger.info("Invalidated cached decision %s: %s", key[:12], last_action_error.splitlines()[0])
+
+    def lookup(self, key: str, axtree_txt: str) -> Optional[Tuple[str, float]]:
+        """(answer with the current page's element ids, confidence) of a trusted decision, or None"""
+        value = self.disk.get(key)
+        entry = json.loads(value) if value else None
+        if entry is None or not self.trusted(entry):
+            self.misses += 1
+            return None
+        _, by_pattern = _element_index(axtree_txt)
+        bids = {}
+        for bid, (pattern, occurrence) in entry["targets"].items():
+            current = by_pattern.get((pattern, occurrence))
+            if current is None:
+                self.misses += 1
+                return None
+            bids[bid] = current
+        answer = entry["answer"]
+        # replace from the end so earlier spans keep their offsets
+        for start, end, bid in reversed(_bid_arguments(answer)):
+            answer = answer[:start] + bids.get(bid, bid) + answer[end:]
+        self.hits += 1
+        self._pending = (key, entry)
+        return answer, self.confidence(entry)
+
+    def expect(self, key: str, answer: str, axtree_txt: str):
+        """Remember the model's answer for this state; it's stored once the next observation shows it worked"""
+        by_bid, _ = _element_index(axtree_txt)
+        targets = {bid: by_bid[bid] for _, _, bid in _bid_arguments(answer) if bid in by_bid}
+        value = self.disk.get(key)
+        entry = json.loads(value) if value else None
+        if entry is None or _canonical_answer(entry["answer"], entry["targets"]) != _canonical_answer(answer, targets):
+            # a different decision for this state starts over
+            entry = {"successes": 0, "failures": 0, "created": time.time()}
+        entry.update(answer=answer, targets=targets)
+        self._pending = (key, entry)
+
+    def close(self):
+        self.disk.close()
@@ -0,0 +1,113 @@
+from typing import Callable, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HistoryEntry:
+    step: int
+    response: str
+    action: str
+    error: Optional[str] = None
+
+    def record(self, max_error_chars: int = 200) -> str:
+        """Compact one-line action/outcome record"""
+        if self.error is None:
+            outcome = "ok"
+        else:
+            error = " ".join(self.error.split())
+            outcome = f"error: {error[:max_error_chars]}{'...' if len(error) > max_error_chars else ''}"
+        return f"- step {self.step}: {self.action} -> {outcome}"
+
+
+def action_of(response: str) -> str:
+    """The action wrapped in triple backticks, or the last line of the response if there is none"""
+    start = response.find("```")
+    end = response.find("```", start + 3) if start != -1 else -1
+    if end != -1:
+        return response[start + 3:end].strip()
+    lines = response.strip().splitlines()
+    return lines[-1] if lines else ""
+
+
+class HistoryManager:
+    """Keeps the prompt's action history bounded regardless of episode length.
+
+    The last `keep_recent` LLM responses are kept verbatim (with their reasoning),
+    older ones are compressed into one-line action/outcome records. With a
+    `summarize` function, once more than `max_records` records pile up the oldest
+    ones are folded into a running summary in a background thread; until that
+    finishes the records are sent as they are, so a step never waits on it.
+    Without one, only the last `max_records` records are kept, after a one-line
+    count of the omitted steps.
+    """
+    def __init__(self, keep_recent: int = 5, max_records: int = 30, summarize: Optional[Callable[[str, List[str]], str]] = None):
+        self.keep_recent = keep_recent
+        self.max_records = max_records
+        self.summarize = summarize
+        self.entries: List[HistoryEntry] = []
+        self.summary = ""
+        # number of entries already folded into the summary
+        self.summarized = 0
+        self._pending: Optional[Future] = None
+        self._executor = ThreadPoolExecutor(max_workers=1) if summarize else None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, response: str):
+        self.entries.append(HistoryEntry(step=len(self.entries), response=response, action=action_of(response)))
+
+    def set_last_outcome(self, error: Optional[str]):
+        """Record the outcome of the last action, known once the next observation arrives"""
+        if self.entries:
+            self.entries[-1].error = error or None
+
+    def last_workflow(self) -> Optional[str]:
+        """Name of the learned workflow the last action ran, if it was a WORKFLOW action that didn't fail"""
+        if not self.entries or self.entries[-1].error or not self.entries[-1].action.startswith("WORKFLOW."):
+            return None
+        return self.entries[-1].action[len("WORKFLOW."):].split("(", 1)[0].strip()
+
+    def _collect_summary(self):
+        if self._pending is None or not self._pending.done():
+            return
+        pending, self._pending = self._pending, None
+        try:
+            self.summary, self.summarized = pending.result()
+        except Exception as e:
+            logger.warning("History summarization failed, keeping the records: %s", e)
+
+    def _maybe_summarize(self, compressed: List[HistoryEntry]):
+        if self.summarize is None or self._pending is not None or len(compressed) <= self.max_records:
+            return
+        # fold the oldest half of the records so the next fold isn't needed right away
+        fold = compressed[:len(compressed) - self.max_records // 2]
+        summary, records, upto = self.summary, [entry.record() for entry in fold], fold[-1].step + 1
+        self._pending = self._executor.submit(lambda: (self.summarize(summary, records), upto))
+
+    def render(self) -> List[dict]:
+        """Prompt parts: running summary, compact records of older steps, then the recent responses verbatim"""
+        self._collect_summary()
+        recent_start = max(len(self.entries) - self.keep_recent, self.summarized)
+        compressed = self.entries[self.summarized:recent_start]
+        self._maybe_summarize(compressed)
+
+        parts = []
+        if self.summarize is None and len(compressed) > self.max_records:
+            omitted = len(compressed) - self.max_records
+            compressed = compressed[omitted:]
+            parts.append({"type": "text", "text": f"\n[{omitted} earlier steps omitted]\n"})
+        if self.summary:
+            parts.append({"type": "text", "text": f"\nSummary of steps 0-{self.summarized - 1}:\n{self.summary}\n"})
+        if compressed:
+            parts.append({"type": "text", "text": "\n" + "\n".join(entry.record() for entry in compressed) + "\n"})
+        parts.extend({"type": "text", "text": f"\n{entry.response}\n"} for entry in self.entries[recent_start:])
+        return parts
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
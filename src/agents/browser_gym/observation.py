@@ -0,0 +1,74 @@
+from typing import Any, Callable, Dict, Mapping
+from concurrent.futures import Executor
+import time
+
+
+class _LazyViews:
+    """Factories and memoized values of derived observation views, shared between copies"""
+    def __init__(self, factories: Mapping[str, Callable[[], Any]]):
+        self.factories = dict(factories)
+        self.values: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+
+    def get(self, key: str) -> Any:
+        if key not in self.values:
+            factory = self.factories.pop(key)
+            start = time.perf_counter()
+            self.values[key] = factory()
+            self.timings[key] = time.perf_counter() - start
+        return self.values[key]
+
+
+class LazyObservation(dict):
+    """Preprocessed observation whose expensive views are computed on first access.
+
+    Plain values are stored as usual. Each view in `factories` is computed the first
+    time it's read, memoized and timed (see `timings`); views that are never read are
+    never computed, and views that were never registered simply don't exist.
+    Copies share the memoized views, and pickling keeps only what was computed.
+    """
+    def __init__(self, values: Mapping[str, Any], factories: Mapping[str, Callable[[], Any]], _views: _LazyViews = None):
+        super().__init__(values)
+        self._views = _views if _views is not None else _LazyViews(factories)
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """Seconds spent computing each view accessed so far"""
+        return self._views.timings
+
+    def _is_lazy(self, key) -> bool:
+        return not dict.__contains__(self, key) and (key in self._views.factories or key in self._views.values)
+
+    def __missing__(self, key):
+        if not self._is_lazy(key):
+            raise KeyError(key)
+        value = self._views.get(key)
+        self[key] = value
+        return value
+
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or self._is_lazy(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *default):
+        if self._is_lazy(key):
+            self[key]
+        return super().pop(key, *default)
+
+    def copy(self) -> "LazyObservation":
+        return LazyObservation(dict(self), {}, _views=self._views)
+
+    def prefetch(self, executor: Executor):
+        """Start computing every pending view on `executor`, in parallel; reading a view then waits for it"""
+        views = self._views
+        futures = {key: executor.submit(factory) for key, factory in views.factories.items()}
+        views.factories = {key: future.result for key, future in futures.items()}
+
+    def computed(self) -> Dict[str, Any]:
+        """Plain dict of the stored values and every view computed so far"""
+        return {**self._views.values, **dict(self)}
+
+    def __reduce__(self):
+        return (dict, (self.computed(),))
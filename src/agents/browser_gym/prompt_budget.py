@@ -0,0 +1,190 @@
+from typing import Any, Callable, Dict, List, Optional
+from dataclasses import dataclass, field
+import logging
+
+logger = logging.getLogger(__name__)
+
+# context windows in tokens, matched on the longest model name prefix
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "o1": 200000,
+    "o3": 200000,
+    "o4-mini": 200000,
+}
+DEFAULT_CONTEXT_WINDOW = 128000
+# what OpenAI bills for a detail="auto" image tile grid, a conservative estimate
+IMAGE_TOKENS = 765
+
+Part = Dict[str, Any]
+
+
+def context_window(model_name: str) -> int:
+    matches = [prefix for prefix in CONTEXT_WINDOWS if model_name.startswith(prefix)]
+    return CONTEXT_WINDOWS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+
+
+class TokenCounter:
+    """Counts tokens with the model's tiktoken encoding, or ~4 characters per token if tiktoken isn't installed"""
+    def __init__(self, model_name: str):
+        try:
+            import tiktoken
+        except ImportError:
+            self.encoding = None
+            return
+        try:
+            self.encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("o200k_base")
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count_part(self, part: Part) -> int:
+        return self.count(part["text"]) if part["type"] == "text" else IMAGE_TOKENS
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is None:
+            return text[:max_tokens * 4]
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+
+
+# A trimmer shrinks a section's parts to at most max_tokens, from its lowest-value content
+Trimmer = Callable[[List[Part], int, TokenCounter], List[Part]]
+
+
+def trim_oldest_first(parts: List[Part], max_tokens: int, counter: TokenCounter) -> List[Part]:
+    """Drop the oldest entries after the heading part, noting how many were omitted"""
+    heading, entries = parts[:1], parts[1:]
+    budget = max_tokens - sum(counter.count_part(part) for part in heading)
+    kept: List[Part] = []
+    for part in reversed(entries):
+        tokens = counter.count_part(part)
+        # leave room for the omission note
+        if tokens > budget - 16:
+            break
+        kept.append(part)
+        budget -= tokens
+    if not kept:
+        return []
+    omitted = len(entries) - len(kept)
+    note = [{"type": "text", "text": f"\n({omitted} earlier entries omitted)\n"}] if omitted else []
+    return heading + note + kept[::-1]
+
+
+def trim_deepest_lines(parts: List[Part], max_tokens: int, counter: TokenCounter) -> List[Part]:
+    """Drop the most deeply indented lines of a tree (e.g. the AXTree) until it fits, then truncate"""
+    text = "\n".join(part["text"] for part in parts if part["type"] == "text")
+    lines = text.split("\n")
+    depths = [len(line) - len(line.lstrip()) for line in lines]
+    tokens_by_depth: Dict[int, int] = {}
+    for line, depth in zip(lines, depths):
+        tokens_by_depth[depth] = tokens_by_depth.get(depth, 0) + counter.count(line) + 1
+
+    # keep the deepest level such that every line at or above it fits, then the
+    # first lines of the next level while there's room
+    max_depth, total = -1, 0
+    for depth in sorted(tokens_by_depth):
+        if total + tokens_by_depth[depth] > max_tokens - 16:
+            break
+        total += tokens_by_depth[depth]
+        max_depth = depth
+    if max_depth == max(tokens_by_depth):
+        return parts
+    if max_depth < 0:
+        text = counter.truncate(text, max_tokens - 16)
+        return [{"type": "text", "text": text + "\n(truncated)\n"}] if text else []
+    room = max_tokens - 16 - total
+    next_depth = min(depth for depth in tokens_by_depth if depth > max_depth)
+    kept = []
+    for line, depth in zip(lines, depths):
+        if depth == next_depth and room > 0:
+            room -= counter.count(line) + 1
+            if room >= 0:
+                kept.append(line)
+        elif depth <= max_depth:
+            kept.append(line)
+    return [{"type": "text", "text": "\n".join(kept) + "\n(deeper elements omitted)\n"}]
+
+
+def trim_tail(parts: List[Part], max_tokens: int, counter: TokenCounter) -> List[Part]:
+    """Truncate the end of the section's text"""
+    text = "\n".join(part["text"] for part in parts if part["type"] == "text")
+    text = counter.truncate(text, max_tokens - 16)
+    return [{"type": "text", "text": text + "\n(truncated)\n"}] if text else []
+
+
+@dataclass
+class PromptSection:
+    """A titled chunk of the prompt, kept in order; lower priority sections are trimmed first.
+
+    Sections without a trimmer are never cut.
+    """
+    name: str
+    parts: List[Part]
+    priority: int = 0
+    trim: Optional[Trimmer] = None
+    system: bool = False
+
+
+@dataclass
+class AssembledPrompt:
+    system_msgs: List[Part]
+    user_msgs: List[Part]
+    budget: int
+    section_tokens: Dict[str, int] = field(default_factory=dict)
+    trimmed: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def tokens(self) -> int:
+        return sum(self.section_tokens.values())
+
+
+class PromptAssembler:
+    """Fits the prompt sections into a per-model token budget.
+
+    The budget defaults to the model's context window minus room for the response.
+    When the sections don't fit, trimmable sections are shrunk in order of
+    increasing priority, each only as much as still needed, so high-value content
+    (instructions, goal, action space) is kept intact and nothing is paid for twice.
+    """
+    def __init__(self, model_name: str, max_prompt_tokens: Optional[int] = None, reserve_output_tokens: int = 4096):
+        self.counter = TokenCounter(model_name)
+        self.budget = max_prompt_tokens or context_window(model_name) - reserve_output_tokens
+
+    def assemble(self, sections: List[PromptSection]) -> AssembledPrompt:
+        parts = {section.name: section.parts for section in sections}
+        tokens = {section.name: sum(self.counter.count_part(part) for part in section.parts) for section in sections}
+        trimmed: Dict[str, int] = {}
+
+        excess = sum(tokens.values()) - self.budget
+        for section in sorted(sections, key=lambda section: section.priority):
+            if excess <= 0:
+                break
+            if section.trim is None or not tokens[section.name]:
+                continue
+            before = tokens[section.name]
+            parts[section.name] = section.trim(parts[section.name], max(before - excess, 0), self.counter)
+            tokens[section.name] = sum(self.counter.count_part(part) for part in parts[section.name])
+            trimmed[section.name] = before - tokens[section.name]
+            excess -= trimmed[section.name]
+        if excess > 0:
+            logger.warning("Prompt exceeds its %d token budget by %d tokens after trimming", self.budget, excess)
+        if trimmed:
+            logger.info("Trimmed prompt sections to fit %d tokens: %s", self.budget, trimmed)
+
+        return AssembledPrompt(
+            system_msgs=[part for section in sections if section.system for part in parts[section.name]],
+            user_msgs=[part for section in sections if not section.system for part in parts[section.name]],
+            budget=self.budget,
+            section_tokens=tokens,
+            trimmed=trimmed,
+        )
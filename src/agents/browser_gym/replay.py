@@ -0,0 +1,169 @@
+from typing import List, Optional, Tuple
+from dataclasses import dataclass
+import ast
+import logging
+import re
+
+from src.agents.browser_gym.workflow_registry import WorkflowRegistry, WorkflowSequence
+from src.services.lexical_index import tokenize
+from src.utils.data import get_base_url
+from src.utils.redaction import fill_secrets
+
+logger = logging.getLogger(__name__)
+
+_BY_ROLE = re.compile(r'get_by_role\(\s*["\'](?P<role>\w+)["\']\s*,\s*name\s*=\s*["\'](?P<name>[^"\'\\]+)["\']')
+_BY_TEXT = re.compile(r'get_by_(?:text|label|placeholder)\(\s*["\'](?P<name>[^"\'\\]+)["\']')
+
+
+@dataclass
+class Precondition:
+    """What must hold on the page before a replayed step runs"""
+    base_url: str
+    # role and accessible name of the first element the step acts on, role None for text-only locators
+    role: Optional[str] = None
+    name: Optional[str] = None
+
+    def check(self, url: str, axtree_txt: Optional[str]) -> Optional[str]:
+        """None if the page satisfies the precondition, else the reason it doesn't"""
+        if get_base_url(url) != self.base_url:
+            return f"expected a page on {self.base_url}, got {url}"
+        if axtree_txt is None or self.name is None:
+            return None
+        name = re.escape(self.name.strip())
+        pattern = rf"\b{re.escape(self.role)} '[^'\n]*{name}" if self.role else name
+        if not re.search(pattern, axtree_txt):
+            return f"no {self.role or 'element'} named {self.name.strip()!r} on the page"
+        return None
+
+
+def first_locator(source: str) -> Tuple[Optional[str], Optional[str]]:
+    """(role, name) of the first get_by_role/get_by_text/... locator in a skill's source"""
+    matches = [match for match in (_BY_ROLE.search(source), _BY_TEXT.search(source)) if match]
+    if not matches:
+        return None, None
+    match = min(matches, key=lambda match: match.start())
+    return match.groupdict().get("role"), match.group("name")
+
+
+def literal_arguments(call: str) -> List[str]:
+    """Every literal the call passes (strings, numbers, also inside lists and dicts), as text"""
+    try:
+        tree = ast.parse(call, mode="eval")
+    except SyntaxError:
+        return []
+    literals = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and not isinstance(node.value, bool) and node.value is not None:
+            literals.append(str(node.value))
+    return literals
+
+
+def missing_secrets(sequence: WorkflowSequence, goal: str) -> List[str]:
+    """Redacted credential parameters of the demonstration that neither the goal nor the environment provides"""
+    return [parameter for call in sequence.calls for parameter in fill_secrets(call, goal)[1]]
+
+
+def arguments_in_goal(sequence: WorkflowSequence, goal: str) -> List[str]:
+    """Literal arguments of the demonstration the goal doesn't mention; empty if the goal covers them all"""
+    goal = " ".join(goal.lower().split())
+    return [literal for call in sequence.calls for literal in literal_arguments(call) if literal.strip().lower() not in goal]
+
+
+class ReplayEngine:
+    """Replays a demonstrated workflow step by step without calling the model.
+
+    Each step is the WORKFLOW action the demonstration called, with the same
+    arguments. Credentials were redacted from the demonstration at ingest, so they
+    are filled in from the goal or WORKFLOW_SECRET_<PARAMETER> environment variables
+    instead of re-sending recorded ones. Before emitting a step, the page must be on the demonstration's site and
+    show the element the step's skill acts on first. When a check fails, or a
+    replayed action errors, the engine disengages for the rest of the episode and
+    the agent falls back to the model from the current page.
+    """
+    def __init__(self, registry: WorkflowRegistry, sequence: WorkflowSequence, goal: str = ""):
+        self.registry = registry
+        self.sequence = sequence
+        # the demonstrated calls with their credentials filled in
+        self.calls = [fill_secrets(call, goal)[0] for call in sequence.calls]
+        self.position = 0
+        self.engaged = True
+        self.preconditions: List[Precondition] = []
+        for call in sequence.calls:
+            action = registry.actions.get(call.split("(", 1)[0])
+            role, name = first_locator(action.source) if action else (None, None)
+            self.preconditions.append(Precondition(base_url=get_base_url(sequence.url), role=role, name=name))
+
+    @classmethod
+    def select(cls, registry: WorkflowRegistry, goal: str, url: str, session_id: Optional[str] = None, min_score: float = 0.3) -> Optional["ReplayEngine"]:
+        """Engine for the demonstration of `session_id`, or for the one on this site that best matches the goal.
+
+        Without a `session_id`, a demonstration matches only if the goal mentions every
+        literal argument it passed (tickers, dates, emails...) and at least `min_score` of
+        the goal's words appear in its calls. A demonstration for other arguments would
+        replay a different task, so it is left to the model. Either way, every credential
+        it needs must come from the goal or the environment.
+        """
+        candidates = [sequence for sequence in registry.sequences if session_id in (None, sequence.session_id)]
+        if session_id is None:
+            candidates = [sequence for sequence in candidates if get_base_url(sequence.url) == get_base_url(url)]
+        goal_words = {word for word in tokenize(goal) if len(word) > 2}
+        best, best_score = None, 0.0
+        for sequence in candidates:
+            if session_id is not None:
+                best = sequence
+                break
+            unmatched = arguments_in_goal(sequence, goal)
+            if unmatched:
+                logger.info("Not replaying %s, the goal doesn't mention its arguments %s", sequence.session_id, unmatched)
+                continue
+            secrets = missing_secrets(sequence, goal)
+            if secrets:
+                logger.info("Not replaying %s, no credentials given for %s", sequence.session_id, secrets)
+                continue
+            words = set(tokenize(" ".join(sequence.calls)))
+            score = len(goal_words & words) / len(goal_words) if goal_words else 0.0
+            if score > best_score:
+                best, best_score = sequence, score
+        if best is None or (session_id is None and best_score < min_score):
+            return None
+        missing = [call for call in best.calls if call.split("(", 1)[0] not in registry]
+        if missing:
+            logger.warning("Not replaying %s, its skills %s aren't registered", best.session_id, missing)
+            return None
+        secrets = missing_secrets(best, goal)
+        if secrets:
+            logger.warning("Not replaying %s, set %s or give them in the goal", best.session_id, ", ".join(f"WORKFLOW_SECRET_{name.upper()}" for name in secrets))
+            return None
+        logger.info("Replaying the demonstration of %s (%d steps)", best.session_id, len(best.calls))
+        return cls(registry, best, goal)
+
+    @property
+    def finished(self) -> bool:
+        return self.position >= len(self.sequence.calls)
+
+    def disengage(self, reason: str):
+        if self.engaged:
+            logger.info("Replay stopped at step %d/%d, handing over to the model: %s", self.position, len(self.sequence.calls), reason)
+        self.engaged = False
+
+    def next_action(self, url: str, axtree_txt: Optional[str], last_action_error: str = "") -> Optional[str]:
+        """The next replayed action in the agent's answer format, None once the model must take over"""
+        if not self.engaged:
+            return None
+        if last_action_error and self.position:
+            self.disengage(f"step {self.position} failed: {last_action_error}")
+            return None
+        if self.finished:
+            self.engaged = False
+            return f"""\
+The demonstrated workflow {self.sequence.session_id} was replayed to the end.
+```STANDARD.send_msg_to_user("Done: replayed the demonstrated workflow ({len(self.sequence.calls)} steps).")```"""
+        reason = self.preconditions[self.position].check(url, axtree_txt)
+        if reason:
+            self.disengage(reason)
+            return None
+        call = self.calls[self.position]
+        self.position += 1
+        return f"""\
+Replaying step {self.position}/{len(self.sequence.calls)} of the demonstrated workflow {self.sequence.session_id}.
+```WORKFLOW.{call}```"""
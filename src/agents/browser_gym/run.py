@@ -2,11 +2,12 @@ import argparse
 
 # locally defined agent
 from agent import DemoAgentArgs
+from async_agent import AsyncDemoAgentArgs
 
 # browsergym experiments utils
-from browsergym.experiments import EnvArgs, ExpArgs, get_exp_result
+from browsergym.experiments import ExpArgs, get_exp_result
 
-from custom_action_mapping import custom_action_mapping
+from custom_action_mapping import CustomActionEnvArgs
 
 
 def str2bool(v):
@@ -64,6 +65,60 @@ def parse_args():
         default=False,
         help="Use screenshot in the agent's observation space.",
     )
+    parser.add_argument(
+        "--use_axtree_diff",
+        type=str2bool,
+        default=False,
+        help="After the first step on a page, only send the AXTree changes since the last step.",
+    )
+    parser.add_argument(
+        "--max_prompt_tokens",
+        type=int,
+        default=None,
+        help="Token budget of each prompt (default: the model's context window minus room for the response).",
+    )
+    parser.add_argument(
+        "--history_keep_recent",
+        type=int,
+        default=5,
+        help="Number of past LLM responses kept verbatim in the prompt, older steps are compressed.",
+    )
+    parser.add_argument(
+        "--summarize_history",
+        type=str2bool,
+        default=False,
+        help="Summarize old steps in the background with the LLM.",
+    )
+    parser.add_argument(
+        "--workflow_top_k",
+        type=int,
+        default=8,
+        help="Number of learned workflows retrieved for the current page and shown in the prompt.",
+    )
+    parser.add_argument(
+        "--async_llm",
+        type=str2bool,
+        default=False,
+        help="Call the model asynchronously and prepare the next step's prompt while the browser acts.",
+    )
+    parser.add_argument(
+        "--replay",
+        type=str2bool,
+        default=False,
+        help="Replay the demonstrated workflow whose arguments the goal names, without the model, falling back to it when a step's checks fail.",
+    )
+    parser.add_argument(
+        "--replay_session",
+        type=str,
+        default=None,
+        help="Replay the demonstration of this workflow session id (implies --replay).",
+    )
+    parser.add_argument(
+        "--decision_cache",
+        type=str,
+        default=None,
+        help="SQLite file of model decisions to reuse on identical page states across runs (disabled by default).",
+    )
 
     return parser.parse_args()
 
@@ -79,50 +134,28 @@ https://github.com/ServiceNow/AgentLab"""
 
     args = parse_args()
 
-    # Import the custom action mapping here
-    from custom_action_mapping import custom_action_mapping
-
-    # Monkey patch the ExpArgs run method to use our custom action mapping
-    original_run = ExpArgs.run
-    def patched_run(self):
-        # Store the original action mapping
-        if hasattr(self, '_original_action_mapping'):
-            original_action_mapping = self._original_action_mapping
-        else:
-            self._original_action_mapping = None
-            original_action_mapping = None
-            
-        try:
-            # Override the env_args make_env to use our custom mapping
-            original_make_env = self.env_args.make_env
-            def patched_make_env(*args, **kwargs):
-                kwargs['action_mapping'] = custom_action_mapping
-                return original_make_env(*args, **kwargs)
-            self.env_args.make_env = patched_make_env
-            
-            # Run the original method
-            return original_run(self)
-        finally:
-            # Restore original methods
-            self.env_args.make_env = original_make_env
-            if original_action_mapping is not None:
-                self._original_action_mapping = original_action_mapping
-    
-    # Apply the monkey patch
-    ExpArgs.run = patched_run
-
     # setting up agent config
-    agent_args = DemoAgentArgs(
+    agent_args_class = AsyncDemoAgentArgs if args.async_llm else DemoAgentArgs
+    agent_args = agent_args_class(
         model_name=args.model_name,
         chat_mode=False,
         demo_mode="default" if args.visual_effects else "off",
         use_html=args.use_html,
         use_axtree=args.use_axtree,
         use_screenshot=args.use_screenshot,
+        use_axtree_diff=args.use_axtree_diff,
+        max_prompt_tokens=args.max_prompt_tokens,
+        history_keep_recent=args.history_keep_recent,
+        summarize_history=args.summarize_history,
+        workflow_top_k=args.workflow_top_k,
+        replay=args.replay,
+        replay_session=args.replay_session,
+        decision_cache_path=args.decision_cache,
     )
 
     # setting up environment config
-    env_args = EnvArgs(
+    # the env executes actions through our custom action mapping
+    env_args = CustomActionEnvArgs(
         task_name=args.task_name,
         task_seed=None,
         max_steps=100,
@@ -1,5 +1,7 @@
+from typing import Collection, Dict, List, Optional, Tuple, Union
 import base64
 import io
+import re
 from PIL import Image
 import numpy as np
 
@@ -17,74 +19,112 @@ def image_to_jpg_base64_url(image: np.ndarray | Image.Image):
 
     return f"data:image/jpeg;base64,{image_base64}"
 
-def deduplicate_axtree(axtree_text: str, threshold: int = 50) -> str:
+_QUOTED = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+def axtree_pattern(line: str, wildcard_text: bool = True, wildcard_numbers: bool = True) -> Tuple[str, str]:
+    """
+    Pattern key of an AXTree line: its role and attributes without the bid, with quoted text
+    and numbers optionally replaced by wildcards.
+
+    Returns:
+        (role, pattern), e.g. ("option", "option '*', selected=False") for "[123] option 'Revenue', selected=False"
     """
-    Deduplicates repetitive elements in AXTree text while preserving structure.
-    
+    core = line.strip()
+    if core.startswith('['):
+        end = core.find(']')
+        if end != -1:
+            core = core[end + 1:].strip()
+    if wildcard_text:
+        core = _QUOTED.sub("'*'", core)
+    if wildcard_numbers:
+        core = _NUMBER.sub('#', core)
+    return core.split(' ', 1)[0], core
+
+def deduplicate_axtree(
+    axtree_text: str,
+    threshold: int = 50,
+    roles: Optional[Collection[str]] = None,
+    keep: int = 1,
+    wildcard_text: bool = True,
+    wildcard_numbers: bool = True,
+) -> str:
+    """
+    Collapses runs of repetitive sibling elements in AXTree text while preserving structure.
+
+    Each line gets a pattern key (see axtree_pattern) and each subtree a signature built
+    from its key and its children's signatures, so repeated nested structures such as
+    table rows or list items with their cells collapse as a whole. Runs of more than
+    `threshold` consecutive siblings with the same signature keep their first `keep`
+    subtrees followed by a summary line. Runs in one pass over the lines.
+
     Args:
         axtree_text: String containing the AXTree text representation
         threshold: Minimum number of similar elements before collapsing
-        
+        roles: Roles whose runs may be collapsed, None for any role
+        keep: Number of elements of a collapsed run to keep verbatim
+        wildcard_text: Treat elements that only differ in quoted text (names, values) as similar
+        wildcard_numbers: Treat elements that only differ in numbers as similar
+
     Returns:
         Filtered AXTree text with collapsed duplicate sections
     """
-    lines = axtree_text.split('\n')
+    lines = [line for line in axtree_text.split('\n') if line.strip()]
+    n = len(lines)
+    indents = [len(line) - len(line.lstrip()) for line in lines]
+    patterns = [axtree_pattern(line, wildcard_text, wildcard_numbers) for line in lines]
+
+    # children of each node, -1 being a virtual root above the top-level lines
+    children: Dict[int, List[int]] = {-1: []}
+    signatures = [0] * n
+    stack = [-1]
+
+    def close(node: int):
+        signatures[node] = hash((patterns[node][1], tuple(signatures[child] for child in children[node])))
+
+    for i in range(n):
+        while len(stack) > 1 and indents[stack[-1]] >= indents[i]:
+            close(stack.pop())
+        children[stack[-1]].append(i)
+        children[i] = []
+        stack.append(i)
+    while len(stack) > 1:
+        close(stack.pop())
+
+    # (first node, run length) of every collapsible run, keyed by the first node
+    runs: Dict[int, int] = {}
+    for siblings in children.values():
+        start = 0
+        while start < len(siblings):
+            end = start + 1
+            while end < len(siblings) and signatures[siblings[end]] == signatures[siblings[start]]:
+                end += 1
+            count = end - start
+            if count > threshold and (roles is None or patterns[siblings[start]][0] in roles):
+                runs[siblings[start]] = count
+            start = end
+
     filtered_lines = []
-    current_group = []
-    current_pattern = None
-    
-    def get_element_pattern(line: str) -> tuple:
-        """Extract the key pattern from a line, excluding the ID."""
-        # Handle indentation
-        indent = len(line) - len(line.lstrip())
-        line = line.strip()
-        
-        # Skip non-element lines
-        if not line.startswith('['):
-            return (indent, line)
-            
-        # Extract the core pattern without the ID
-        try:
-            # Remove the ID section
-            core = line[line.index(']') + 1:].strip()
-            # Create pattern tuple including indent and attributes
-            return (indent, core)
-        except ValueError:
-            return (indent, line)
-    
-    def format_group(group: list, count: int) -> list:
-        """Format a group of similar elements."""
-        if count <= threshold:
-            return group
-        
-        # Keep the first element
-        result = [group[0]]
-        # Add the summary line with proper indentation
-        indent = ' ' * (len(group[0]) - len(group[0].lstrip()))
-        pattern = get_element_pattern(group[0])[1]
-        result.append(f"{indent}[... {count-1} similar elements: {pattern} ...]")
-        return result
-    
-    for line in lines:
-        if not line.strip():
+    # explicit DFS so deep trees don't hit the recursion limit; a frame is either a
+    # (sibling list, position, whether runs collapse) to continue from or a summary line
+    frames: List[Union[Tuple[List[int], int, bool], str]] = [(children[-1], 0, True)]
+    while frames:
+        frame = frames.pop()
+        if isinstance(frame, str):
+            filtered_lines.append(frame)
+            continue
+        siblings, position, collapse = frame
+        if position >= len(siblings):
             continue
-            
-        pattern = get_element_pattern(line)
-        
-        # Handle non-element lines or different indentation levels
-        if not pattern[1].startswith('checkbox') or pattern != get_element_pattern(current_group[0]) if current_group else None:
-            # Process any existing group
-            if current_group:
-                filtered_lines.extend(format_group(current_group, len(current_group)))
-                current_group = []
-            filtered_lines.append(line)
+        node = siblings[position]
+        count = runs.get(node, 1) if collapse else 1
+        frames.append((siblings, position + count, collapse))
+        if count == 1:
+            filtered_lines.append(lines[node])
+            frames.append((children[node], 0, True))
             continue
-        
-        # Continue building current group
-        current_group.append(line)
-    
-    # Process the last group if it exists
-    if current_group:
-        filtered_lines.extend(format_group(current_group, len(current_group)))
-    
-    return '\n'.join(filtered_lines)
\ No newline at end of file
+        kept = min(keep, count)
+        indent = lines[node][:indents[node]]
+        frames.append(f"{indent}[... {count - kept} similar elements: {patterns[node][1]} ...]")
+        frames.append((siblings[position:position + kept], 0, False))
+    return '\n'.join(filtered_lines)
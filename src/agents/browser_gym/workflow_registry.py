@@ -0,0 +1,230 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+import ast
+import inspect
+import json
+import os
+import re
+
+from src.agents.browser_gym import action_library
+from src.utils.redaction import redact
+
+DEFAULT_MANIFEST_PATH = os.environ.get("WORKFLOW_MANIFEST", "skill_store/ingested_workflows.json")
+
+_NO_DEFAULT = inspect.Parameter.empty
+
+# docstring lines that don't apply to the WORKFLOW action: the `page` it's called on, the code generator's return value
+_HIDDEN_DOC_LINE = re.compile(r'^\s*(?::param page:|page(?: \([^)]*\))?:|Returns the Python code to execute\.)')
+
+
+@dataclass
+class WorkflowAction:
+    """A routable WORKFLOW.<name>(...) action with its precomputed signature"""
+    name: str
+    signature: inspect.Signature
+    docstring: str
+    to_code: Callable[[inspect.BoundArguments], str]
+    source: str = ""
+    # signature shown to the model, e.g. "(start_date: str, end_date: str) -> None"
+    display_signature: str = ""
+
+    def describe(self) -> str:
+        signature = self.display_signature or f"{self.signature.replace(return_annotation=inspect.Signature.empty)} -> None"
+        if not self.docstring:
+            return f"def {self.name}{signature}: ..."
+        docstring = "\n".join(f"    {line}" if line else "" for line in self.docstring.splitlines())
+        return f'def {self.name}{signature}:\n    """\n{docstring}\n    """'
+
+
+@dataclass
+class WorkflowSequence:
+    """The order in which a demonstration called its skills, as WORKFLOW actions without `page`.
+
+    Credential arguments read SECRET.<parameter> (see src/utils/redaction.py).
+    """
+    session_id: str
+    url: str
+    calls: List[str]
+
+
+def _source_of(func: Callable) -> str:
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return ""
+
+
+def _signature_from_ast(node: ast.FunctionDef, skip_first: bool) -> inspect.Signature:
+    """Build an inspect.Signature without executing the function (annotations are dropped)"""
+    arguments = node.args
+    positional = arguments.posonlyargs + arguments.args
+    defaults = [_NO_DEFAULT] * (len(positional) - len(arguments.defaults)) + [ast.literal_eval(d) for d in arguments.defaults]
+    parameters = []
+    for i, (arg, default) in enumerate(zip(positional, defaults)):
+        if skip_first and i == 0:
+            continue
+        kind = inspect.Parameter.POSITIONAL_ONLY if i < len(arguments.posonlyargs) else inspect.Parameter.POSITIONAL_OR_KEYWORD
+        parameters.append(inspect.Parameter(arg.arg, kind, default=default))
+    if arguments.vararg:
+        parameters.append(inspect.Parameter(arguments.vararg.arg, inspect.Parameter.VAR_POSITIONAL))
+    for arg, default in zip(arguments.kwonlyargs, arguments.kw_defaults):
+        parameters.append(inspect.Parameter(
+            arg.arg, inspect.Parameter.KEYWORD_ONLY, default=_NO_DEFAULT if default is None else ast.literal_eval(default)
+        ))
+    if arguments.kwarg:
+        parameters.append(inspect.Parameter(arguments.kwarg.arg, inspect.Parameter.VAR_KEYWORD))
+    return inspect.Signature(parameters)
+
+
+def _display_signature(node: ast.FunctionDef) -> str:
+    """The function's annotated signature without its first (page) parameter, returning None unless annotated"""
+    arguments = ast.arguments(
+        posonlyargs=node.args.posonlyargs[1:] if node.args.posonlyargs else [],
+        args=node.args.args if node.args.posonlyargs else node.args.args[1:],
+        vararg=node.args.vararg,
+        kwonlyargs=node.args.kwonlyargs,
+        kw_defaults=node.args.kw_defaults,
+        kwarg=node.args.kwarg,
+        defaults=node.args.defaults,
+    )
+    returns = ast.unparse(node.returns) if node.returns else "None"
+    return f"({ast.unparse(arguments)}) -> {returns}"
+
+
+def _clean_docstring(docstring: str) -> str:
+    """Docstring without the lines about `page` or generated code, and without trailing blank lines"""
+    return "\n".join(line for line in docstring.splitlines() if not _HIDDEN_DOC_LINE.match(line)).rstrip()
+
+
+def _render_call(name: str, bound: inspect.BoundArguments) -> str:
+    args = ["page"] + [repr(value) for value in bound.args] + [f"{key}={value!r}" for key, value in bound.kwargs.items()]
+    return f"{name}({', '.join(args)})"
+
+
+class WorkflowRegistry:
+    """Maps WORKFLOW action names to code generators, built once from the ingested workflow libraries.
+
+    Dispatch is a dict lookup, arguments are parsed with `ast` and `ast.literal_eval`
+    and bound against the precomputed signature, so routing a learned workflow
+    costs no regex matching or imports per call.
+    """
+    def __init__(self):
+        self.actions: Dict[str, WorkflowAction] = {}
+        # demonstrated orders of WORKFLOW actions, e.g. calls=["navigate_to_data_source()", "set_date_range('2020-01', '2024-12')"]
+        self.sequences: List[WorkflowSequence] = []
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.actions
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def register(self, func: Callable[..., str], name: Optional[str] = None):
+        """Register a function that takes the action's arguments and returns the Python code to execute"""
+        self.actions[name or func.__name__] = WorkflowAction(
+            name=name or func.__name__,
+            signature=inspect.signature(func),
+            docstring=_clean_docstring(inspect.getdoc(func) or ""),
+            to_code=lambda bound: func(*bound.args, **bound.kwargs),
+            source=_source_of(func),
+        )
+
+    def register_source(self, source: str, imports: Iterable[str] = ()):
+        """Register a learned workflow function `def name(page, ...)` from its source.
+
+        The generated code defines the function and calls it on the env's `page`.
+        """
+        node = ast.parse(source).body[0]
+        if not isinstance(node, ast.FunctionDef):
+            raise ValueError(f"Expected a function definition, got {type(node).__name__}")
+        prelude = "\n".join(list(imports) + ["", source, ""])
+        name = node.name
+        self.actions[name] = WorkflowAction(
+            name=name,
+            signature=_signature_from_ast(node, skip_first=True),
+            docstring=_clean_docstring(ast.get_docstring(node) or ""),
+            to_code=lambda bound: prelude + _render_call(name, bound),
+            source=source,
+            display_signature=_display_signature(node),
+        )
+
+    def register_manifest(self, manifest: Dict[str, Dict[str, Any]]):
+        """Register every skill of a WorkflowIngester manifest, later sessions overriding earlier ones"""
+        for path in sorted(manifest):
+            entry = manifest[path]
+            for function in entry["functions"]:
+                self.register_source(function["source"], entry.get("imports", []))
+            if entry.get("sequence"):
+                # manifests ingested before sequences were redacted may still hold credentials
+                self.sequences.append(WorkflowSequence(
+                    session_id=entry.get("session_id", ""), url=entry.get("url", ""), calls=[self._redact(call) for call in entry["sequence"]]
+                ))
+
+    def _redact(self, call: str) -> str:
+        action = self.actions.get(call.split("(", 1)[0])
+        return redact(call, list(action.signature.parameters)) if action else call
+
+    @classmethod
+    def build(cls, manifest_path: Optional[str] = DEFAULT_MANIFEST_PATH) -> "WorkflowRegistry":
+        """Registry of all ingested workflows plus the hand-written action library.
+
+        A hand-written action takes precedence for the code it generates, but a learned
+        skill of the same name keeps describing it: its signature and docs are the skill's.
+        """
+        registry = cls()
+        if manifest_path and Path(manifest_path).exists():
+            with open(manifest_path, 'r') as f:
+                registry.register_manifest(json.load(f))
+        for func in (
+            action_library.navigate_to_data_source,
+            action_library.set_date_range,
+            action_library.enter_ticker,
+            action_library.add_variables,
+            action_library.set_output_options,
+            action_library.perform_query_and_download,
+        ):
+            learned = registry.actions.get(func.__name__)
+            registry.register(func)
+            if learned is not None:
+                registry.actions[func.__name__].docstring = learned.docstring
+                registry.actions[func.__name__].display_signature = learned.display_signature
+                registry.actions[func.__name__].source = learned.source
+        return registry
+
+    def to_python_code(self, action: str) -> str:
+        """Translate `name(arg, key=value, ...)` into the Python code to execute"""
+        try:
+            call = ast.parse(action.strip(), mode="eval").body
+        except SyntaxError as e:
+            raise ValueError(f"Invalid WORKFLOW action format: '{action}': {e}")
+        if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Name):
+            raise ValueError(f"Invalid WORKFLOW action format: '{action}'. Must be a call like name(arg=value).")
+
+        workflow = self.actions.get(call.func.id)
+        if workflow is None:
+            raise ValueError(f"Unknown workflow action: {call.func.id}")
+        try:
+            args = [ast.literal_eval(arg) for arg in call.args]
+            kwargs = {keyword.arg: ast.literal_eval(keyword.value) for keyword in call.keywords if keyword.arg}
+            bound = workflow.signature.bind(*args, **kwargs)
+        except (ValueError, TypeError, SyntaxError) as e:
+            raise ValueError(f"Invalid arguments for {workflow.name}{workflow.signature}: {e}")
+        bound.apply_defaults()
+        return workflow.to_code(bound)
+
+    def next_steps(self, name: str) -> List[str]:
+        """Demonstrated calls that directly followed a call to `name`, most frequent first"""
+        following = Counter(
+            sequence.calls[i + 1]
+            for sequence in self.sequences
+            for i in range(len(sequence.calls) - 1)
+            if sequence.calls[i].split("(", 1)[0] == name
+        )
+        return [call for call, _ in following.most_common()]
+
+    def describe(self, names: Optional[Iterable[str]] = None) -> str:
+        """Signatures and docstrings of the given (default: all) workflow actions"""
+        names = self.actions if names is None else names
+        return "\n\n".join(self.actions[name].describe() for name in names if name in self.actions)
@@ -0,0 +1,170 @@
+from typing import List, Optional, Tuple
+from collections import OrderedDict
+import json
+import logging
+import os
+import threading
+import urllib.error
+import urllib.request
+
+from src.agents.browser_gym.prompt_budget import TokenCounter
+from src.agents.browser_gym.workflow_registry import WorkflowRegistry
+from src.services.lexical_index import BM25Index
+from src.utils.data import get_base_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRIEVAL_URL = os.environ.get("SKILL_RETRIEVAL_URL", "http://127.0.0.1:8765")
+
+WORKFLOW_SPACE_HEADING = "# Workflow Action Space - A library atomic subworkflows that your employer demonstrated to you that might be relevant to this task."
+
+
+class _RegistrySkills:
+    """The registry's actions as skill records with the fields BM25Index indexes"""
+    def __init__(self, registry: WorkflowRegistry):
+        self.skills = [
+            {"name": name, "signature": action.display_signature, "docstring": action.docstring, "code": action.source}
+            for name, action in registry.actions.items()
+        ]
+
+
+class WorkflowActionSpace:
+    """Picks the learned workflows relevant to the current page and goal for the prompt.
+
+    Skills are ranked by the skill retrieval API (see src/scripts/serve_retrieval_api.py)
+    with the page's URL, title and the goal, falling back to the same BM25 scoring
+    over the registry when the API is unreachable. Only skills the registry can
+    execute are kept, and only their signatures and docstrings are sent, up to
+    `top_k` skills and `max_tokens` tokens, so the prompt stays the same size however
+    large the learned library grows. After a learned workflow ran, the steps that
+    followed it in the demonstrations are suggested first. Rendered texts are reused
+    while the site, title, goal and last workflow don't change. Renders prepared ahead
+    for the next step (`speculative=True`) are used only if the page they guessed the
+    title of has it; `speculation_hits`/`speculation_misses` count both outcomes.
+    """
+    def __init__(
+        self,
+        registry: WorkflowRegistry,
+        counter: TokenCounter,
+        top_k: int = 8,
+        max_tokens: int = 2000,
+        retrieval_url: Optional[str] = DEFAULT_RETRIEVAL_URL,
+        timeout: float = 2.0,
+    ):
+        self.registry = registry
+        self.counter = counter
+        self.top_k = top_k
+        self.max_tokens = max_tokens
+        self.retrieval_url = retrieval_url
+        self.timeout = timeout
+        self._rendered: "OrderedDict[Tuple[str, str, str, Optional[str]], str]" = OrderedDict()
+        # renders prepared for the next step: (site, goal, last workflow) -> (guessed title, text)
+        self._speculated: "OrderedDict[Tuple[str, str, Optional[str]], Tuple[str, str]]" = OrderedDict()
+        # renders may run on several threads at once
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.speculation_hits = 0
+        self.speculation_misses = 0
+        # BM25 over the registry, for ranking without the API
+        self._local_index: Optional[BM25Index] = None
+
+    def retrieve(self, url: str, text: str) -> Optional[List[str]]:
+        """Skill names ranked by the retrieval API, None if it can't be reached"""
+        if not self.retrieval_url:
+            return None
+        request = urllib.request.Request(
+            f"{self.retrieval_url.rstrip('/')}/retrieve",
+            data=json.dumps({"url": url, "text": text, "top_n": self.top_k * 2}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                results = json.load(response)["results"]
+        except (urllib.error.URLError, TimeoutError, ValueError, KeyError) as e:
+            logger.warning("Skill retrieval API unavailable, ranking workflows locally from now on: %s", e)
+            # don't wait on the timeout again at every page change
+            self.retrieval_url = None
+            return None
+        return [result["skill"]["name"] for result in results if "name" in result["skill"]]
+
+    def rank_locally(self, text: str) -> List[str]:
+        """Registry actions ranked by BM25 over their names, signatures, docstrings and locators, as the API ranks skills"""
+        with self._lock:
+            if self._local_index is None or len(self._local_index) != len(self.registry):
+                self._local_index = BM25Index(_RegistrySkills(self.registry))
+            index = self._local_index
+            ids, _ = index.search_ids(text, len(self.registry))
+        return [index.store.skills[i]["name"] for i in ids.tolist()]
+
+    def _build(self, url: str, title: str, goal: str, last_workflow: Optional[str]) -> str:
+        text = f"{goal}\n{title}"
+        names = self.retrieve(url, text)
+        if names is None:
+            # the API picks the site's store from the URL; locally its words can only be matched
+            names = self.rank_locally(f"{text}\n{url}")
+
+        lines, budget, seen = [WORKFLOW_SPACE_HEADING, ""], self.max_tokens, set()
+        next_steps = self.registry.next_steps(last_workflow)[:2] if last_workflow else []
+        if next_steps:
+            lines.append(f"In the demonstrations, {last_workflow} was followed by: " + ", ".join(f"WORKFLOW.{call}" for call in next_steps))
+            lines.append("")
+            names = [call.split("(", 1)[0] for call in next_steps] + list(names)
+        for name in names:
+            if len(seen) >= self.top_k:
+                break
+            if name in seen or name not in self.registry:
+                continue
+            description = self.registry.describe([name])
+            tokens = self.counter.count(description)
+            if tokens > budget:
+                continue
+            seen.add(name)
+            budget -= tokens
+            lines.extend([description, ""])
+        if not seen:
+            lines.extend(["(No learned workflows are relevant to this page, use standard actions.)", ""])
+        return "\n".join(lines)
+
+    def render(self, url: str, title: str, goal: str, last_workflow: Optional[str] = None, speculative: bool = False) -> str:
+        """Workflow action space section for the page; `last_workflow` is the WORKFLOW action that just ran.
+
+        With `speculative=True` the section is prepared for the next step, before the action
+        that leads to it ran: `title` is then only a guess, and the render is kept aside under
+        the site, goal and last workflow until a step on a page with that title claims it.
+        """
+        base_url = get_base_url(url)
+        key = (base_url, title, goal, last_workflow)
+        speculative_key = (base_url, goal, last_workflow)
+        with self._lock:
+            if key in self._rendered:
+                self._rendered.move_to_end(key)
+                if not speculative:
+                    self.hits += 1
+                return self._rendered[key]
+            if not speculative and speculative_key in self._speculated:
+                guessed_title, rendered = self._speculated.pop(speculative_key)
+                if guessed_title == title:
+                    self.hits += 1
+                    self.speculation_hits += 1
+                    self._remember(key, rendered)
+                    return rendered
+                self.speculation_misses += 1
+
+        rendered = self._build(url, title, goal, last_workflow)
+        with self._lock:
+            if speculative:
+                self._speculated[speculative_key] = (title, rendered)
+                self._speculated.move_to_end(speculative_key)
+                while len(self._speculated) > 4:
+                    self._speculated.popitem(last=False)
+            else:
+                self.misses += 1
+                self._remember(key, rendered)
+        return rendered
+
+    def _remember(self, key: Tuple[str, str, str, Optional[str]], rendered: str):
+        # lock must be held
+        self._rendered[key] = rendered
+        while len(self._rendered) > 8:
+            self._rendered.popitem(last=False)
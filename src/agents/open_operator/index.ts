@@ -5,6 +5,10 @@ import { ObserveResult, Stagehand } from "@browserbasehq/stagehand";
 
 const LLMClient = openai("gpt-4o");
 
+// skill retrieval API served by src/scripts/serve_retrieval_api.py
+const SKILL_RETRIEVAL_URL =
+  process.env.SKILL_RETRIEVAL_URL ?? "http://127.0.0.1:8765";
+
 type Step = {
   text: string;
   reasoning: string;
@@ -88,6 +92,38 @@ async function runStagehand({
   }
 }
 
+type RetrievedSkill = {
+  skill: { name?: string; signature?: string; docstring?: string; [key: string]: unknown };
+  score: number;
+};
+
+async function retrieveSkills({
+  url,
+  text,
+  topN = 5,
+}: {
+  url: string;
+  text: string;
+  topN?: number;
+}): Promise<RetrievedSkill[]> {
+  try {
+    const response = await fetch(`${SKILL_RETRIEVAL_URL}/retrieve`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ url, text, top_n: topN }),
+    });
+    if (!response.ok) {
+      console.error("Skill retrieval failed:", await response.text());
+      return [];
+    }
+    const { results } = (await response.json()) as { results: RetrievedSkill[] };
+    return results;
+  } catch (error) {
+    console.error("Error retrieving skills:", error);
+    return [];
+  }
+}
+
 async function sendPrompt({
   goal,
   sessionID,
@@ -113,6 +149,10 @@ async function sendPrompt({
     console.error("Error getting page info:", error);
   }
 
+  const skills = currentUrl
+    ? await retrieveSkills({ url: currentUrl, text: goal })
+    : [];
+
   const content: UserContent = [
     {
       type: "text",
@@ -164,6 +204,19 @@ async function sendPrompt({
     });
   }
 
+  if (skills.length > 0) {
+    content.push({
+      type: "text",
+      text: `Learned skills demonstrated on this site that may help:
+${skills
+  .map(
+    ({ skill }) =>
+      `- ${skill.signature ?? skill.name}${skill.docstring ? `: ${skill.docstring}` : ""}`
+  )
+  .join("\n")}`,
+    });
+  }
+
   if (previousExtraction) {
     content.push({
       type: "text",
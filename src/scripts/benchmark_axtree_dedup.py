@@ -0,0 +1,62 @@
+import argparse
+import random
+import time
+
+from src.agents.browser_gym.utils import deduplicate_axtree
+
+ROLES = ["checkbox", "option", "link", "StaticText", "button"]
+
+def synthetic_axtree(target_bytes: int, seed: int = 0) -> str:
+    """AXTree text mixing long flat lists, tables of rows with cells and unique elements"""
+    rng = random.Random(seed)
+    lines = ["[0] RootWebArea 'Benchmark'"]
+    size, bid = 0, 1
+    while size < target_bytes:
+        kind = rng.random()
+        start = len(lines)
+        if kind < 0.4:
+            role = rng.choice(ROLES)
+            lines.append(f"\t[{bid}] list ''")
+            bid += 1
+            for i in range(rng.randint(10, 400)):
+                lines.append(f"\t\t[{bid}] {role} 'item {i} {rng.random():.6f}', checked='false'")
+                bid += 1
+        elif kind < 0.8:
+            lines.append(f"\t[{bid}] table ''")
+            bid += 1
+            for i in range(rng.randint(10, 300)):
+                lines.append(f"\t\t[{bid}] row ''")
+                bid += 1
+                for column in range(4):
+                    lines.append(f"\t\t\t[{bid}] gridcell 'r{i}c{column} {rng.randint(0, 10**6)}'")
+                    bid += 1
+        else:
+            for _ in range(rng.randint(1, 20)):
+                role = rng.choice(ROLES)
+                lines.append(f"\t[{bid}] {role} 'unique {rng.random():.9f}'")
+                bid += 1
+        size += sum(len(line) + 1 for line in lines[start:])
+    return "\n".join(lines)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark AXTree deduplication on large synthetic trees.")
+    parser.add_argument("--sizes_mb", type=float, nargs="+", default=[1, 4, 16], help="Sizes of the synthetic AXTrees in MB.")
+    parser.add_argument("--threshold", type=int, default=50, help="Minimum number of similar elements before collapsing.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per size, the best one is reported.")
+    return parser.parse_args()
+
+def main():
+    """Script to measure deduplicate_axtree throughput and output size on multi-megabyte AXTrees."""
+    args = parse_args()
+    print(f"{'size (MB)':>10} {'lines':>10} {'best (s)':>10} {'MB/s':>8} {'output':>8}")
+    for size_mb in args.sizes_mb:
+        axtree = synthetic_axtree(int(size_mb * 1024 * 1024))
+        best = float("inf")
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            output = deduplicate_axtree(axtree, threshold=args.threshold)
+            best = min(best, time.perf_counter() - start)
+        print(f"{len(axtree) / 2**20:>10.1f} {axtree.count(chr(10)) + 1:>10} {best:>10.3f} {len(axtree) / 2**20 / best:>8.1f} {len(output) / len(axtree):>8.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from src.agents.browser_gym.agent import DemoAgent, axtree_txt_view, pruned_html_view
+
+def synthetic_page(elements: int, seed: int = 0) -> dict:
+    """Raw BrowserGym observation of a page of forms, lists and tables with `elements` elements
+
+    `axtree_object` follows CDP's Accessibility.getFullAXTree and `dom_object` its
+    DOMSnapshot.captureSnapshot, as BrowserGym returns them.
+    """
+    rng = random.Random(seed)
+    strings, string_ids = [], {}
+    def string(value: str) -> int:
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    ax_nodes = [{"nodeId": "0", "role": {"value": "RootWebArea"}, "name": {"value": "Benchmark"}, "childIds": []}]
+    dom = {"parentIndex": [], "nodeType": [], "nodeName": [], "nodeValue": [], "attributes": [], "contentDocumentIndex": {"index": [], "value": []}}
+    def dom_node(parent: int, node_type: int, name: str, value: str = None, attributes=()) -> int:
+        dom["parentIndex"].append(parent)
+        dom["nodeType"].append(node_type)
+        dom["nodeName"].append(string(name))
+        dom["nodeValue"].append(-1 if value is None else string(value))
+        dom["attributes"].append([string(part) for pair in attributes for part in pair])
+        return len(dom["parentIndex"]) - 1
+    def ax_node(parent: dict, role: str, name: str, bid: int) -> dict:
+        node = {"nodeId": str(len(ax_nodes)), "role": {"value": role}, "name": {"value": name}, "browsergym_id": str(bid), "childIds": []}
+        ax_nodes.append(node)
+        parent["childIds"].append(node["nodeId"])
+        return node
+
+    html = dom_node(-1, 1, "HTML")
+    body = dom_node(html, 1, "BODY")
+    bid = 0
+    while bid < elements:
+        kind = rng.random()
+        if kind < 0.4:
+            container, dom_container = ax_node(ax_nodes[0], "list", "", bid), dom_node(body, 1, "UL", attributes=[("bid", str(bid))])
+            rows, role, tag = rng.randint(10, 200), "link", "A"
+        elif kind < 0.8:
+            container, dom_container = ax_node(ax_nodes[0], "table", "", bid), dom_node(body, 1, "TABLE", attributes=[("bid", str(bid))])
+            rows, role, tag = rng.randint(10, 100), "gridcell", "TD"
+        else:
+            container, dom_container = ax_node(ax_nodes[0], "form", "", bid), dom_node(body, 1, "FORM", attributes=[("bid", str(bid))])
+            rows, role, tag = rng.randint(1, 20), "textbox", "INPUT"
+        bid += 1
+        for i in range(rows):
+            name = f"{role} {i} {rng.randint(0, 10**6)}"
+            ax_node(container, role, name, bid)
+            element = dom_node(dom_container, 1, tag, attributes=[("bid", str(bid)), ("class", f"c{i % 7}")])
+            dom_node(element, 3, "#text", name)
+            bid += 1
+
+    return {
+        "chat_messages": [],
+        "goal_object": [{"type": "text", "text": "download revenue from compustat"}],
+        "last_action": "",
+        "last_action_error": "",
+        "open_pages_urls": ["https://example.com/"],
+        "open_pages_titles": ["Benchmark"],
+        "active_page_index": 0,
+        "screenshot": None,
+        "axtree_object": {"nodes": ax_nodes},
+        "dom_object": {"documents": [{"nodes": dom}], "strings": strings},
+    }
+
+def eager_preprocess(obs: dict) -> dict:
+    """obs_preprocessor before views were lazy: every view, every step"""
+    return {
+        "axtree_txt": axtree_txt_view(obs["axtree_object"]),
+        "pruned_html": pruned_html_view(obs["dom_object"]),
+    }
+
+def lazy_preprocess(obs: dict, use_axtree: bool, use_html: bool, executor: ThreadPoolExecutor = None) -> dict:
+    """DemoAgent.obs_preprocessor, then the views its prompt reads"""
+    agent = SimpleNamespace(use_axtree=use_axtree, use_html=use_html, use_screenshot=False)
+    observation = DemoAgent.obs_preprocessor(agent, obs)
+    if executor is not None:
+        observation.prefetch(executor)
+    return {key: observation[key] for key in ("axtree_txt", "pruned_html") if key in observation}
+
+def best_seconds(run, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark DemoAgent observation preprocessing, eager vs lazy views.")
+    parser.add_argument("--elements", type=int, nargs="+", default=[1000, 5000, 20000], help="Numbers of page elements.")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per case, the best one is reported.")
+    return parser.parse_args()
+
+def main():
+    """Script to measure the per-step observation latency of DemoAgent before and after its views became lazy."""
+    args = parse_args()
+    cases = [
+        ("lazy, axtree (default)", dict(use_axtree=True, use_html=False), False),
+        ("lazy, html", dict(use_axtree=False, use_html=True), False),
+        ("lazy, axtree + html", dict(use_axtree=True, use_html=True), False),
+        ("lazy, axtree + html, prefetched", dict(use_axtree=True, use_html=True), True),
+    ]
+    print(f"{'elements':>9} {'case':<32} {'ms':>9} {'vs eager':>9}")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for elements in args.elements:
+            obs = synthetic_page(elements)
+            eager = best_seconds(lambda: eager_preprocess(obs), args.repeats)
+            print(f"{elements:>9} {'eager (before)':<32} {eager * 1000:>9.1f} {1.0:>8.2f}x")
+            for name, config, prefetch in cases:
+                seconds = best_seconds(lambda: lazy_preprocess(obs, executor=executor if prefetch else None, **config), args.repeats)
+                print(f"{elements:>9} {name:<32} {seconds * 1000:>9.1f} {seconds / eager:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from src.services.ann_index import IVFIndex, recall_at_k
+from src.services.vector_store import VectorStore
+
+def synthetic_store(size: int, dim: int, topics: int, seed: int = 0) -> VectorStore:
+    """Store of embeddings clustered around `topics` directions, like skills of many demonstrations of a tool.
+
+    With no topics the embeddings are isotropic Gaussian, without any structure for the index's cells to follow.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((size, dim)).astype(np.float32)
+    if topics:
+        centers = rng.standard_normal((topics, dim)).astype(np.float32)
+        vectors = centers[rng.integers(0, topics, size)] + 1.5 * vectors
+    store = VectorStore()
+    store.add_batch([{"url": "https://example.com", "name": f"skill_{i}"} for i in range(size)], vectors)
+    return store
+
+def synthetic_queries(store: VectorStore, count: int, seed: int = 1) -> np.ndarray:
+    """Noisy copies of stored embeddings, so every query has close neighbours"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(store), size=count, replace=False)
+    return store.vectors(rows) + 0.5 * rng.standard_normal((count, store.dim)).astype(np.float32)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check that IVFIndex meets a recall@k target against exact search.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000], help="Numbers of skills in the synthetic stores.")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension (bge-base is 768).")
+    parser.add_argument("--topics", type=int, default=200, help="Number of clusters the synthetic embeddings are drawn around, 0 for isotropic Gaussian ones.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries per store.")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours compared per query.")
+    parser.add_argument("--nprobe", type=int, default=IVFIndex(VectorStore()).nprobe, help="Cells scored per query (default: IVFIndex's).")
+    parser.add_argument("--target", type=float, default=0.9, help="Minimum recall@k required.")
+    return parser.parse_args()
+
+def main():
+    """Script to verify IVFIndex recall@k against brute-force search on synthetic stores, exiting non-zero below the target."""
+    args = parse_args()
+    print(f"{'skills':>8} {'nprobe':>7} {'recall@' + str(args.k):>10} {'exact (ms)':>11} {'ivf (ms)':>9}")
+    failed = []
+    for size in args.sizes:
+        store = synthetic_store(size, args.dim, args.topics)
+        queries = synthetic_queries(store, args.queries)
+        index = IVFIndex(store, nprobe=args.nprobe, min_size=1)
+        index.sync()
+
+        start = time.perf_counter()
+        store.search_ids_batch(queries, args.k)
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        start = time.perf_counter()
+        index.search_ids_batch(queries, args.k)
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        recall = recall_at_k(index, queries, k=args.k)
+        print(f"{size:>8} {args.nprobe:>7} {recall:>10.3f} {exact_ms:>11.2f} {ivf_ms:>9.2f}")
+        if recall < args.target:
+            failed.append(size)
+
+    if failed:
+        print(f"Recall below {args.target} for store sizes {failed}")
+        sys.exit(1)
+    print(f"Recall@{args.k} >= {args.target} for all store sizes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import argparse
+
+from src.services.skill_retrieval_service import SkillRetrievalService
+from src.services.workflow_ingester import WorkflowIngester
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest demonstrated workflows into the skill store.")
+    parser.add_argument("--workflows_dir", type=str, default="src/scripts/workflows", help="Directory of recorded workflow sessions.")
+    parser.add_argument("--store_dir", type=str, default="skill_store", help="Directory of persistent skill vector DBs.")
+    parser.add_argument("--default_url", type=str, default=None, help="Site to file workflows under when no URL can be found in them.")
+    parser.add_argument("--batch_size", type=int, default=64, help="Number of skills embedded per call.")
+    return parser.parse_args()
+
+def main():
+    """Script to (incrementally) index every refactored_workflow.py into the skill store."""
+    args = parse_args()
+    service = SkillRetrievalService(store_dir=args.store_dir)
+    ingester = WorkflowIngester(service, workflows_dir=args.workflows_dir, default_url=args.default_url)
+    report, counts = ingester.ingest(batch_size=args.batch_size)
+
+    print(f"Workflow files: {counts['scanned']} scanned, {counts['skipped']} unchanged, {counts['parsed']} parsed, {counts['failed']} failed")
+    print(report)
+    for error in report.errors:
+        print(f"- {error.skill.get('name')}: {error.error}")
+
+if __name__ == "__main__":
+    main()
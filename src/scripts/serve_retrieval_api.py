@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+import logging
+
+from src.services.retrieval_server import RetrievalServer
+from src.services.skill_retrieval_service import SkillRetrievalService
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the skill retrieval API for agents.")
+    parser.add_argument("--store_dir", type=str, default="skill_store", help="Directory of persistent skill vector DBs.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind.")
+    parser.add_argument("--batch_window_ms", type=float, default=5.0, help="How long to wait for concurrent queries to batch together.")
+    parser.add_argument("--max_batch_size", type=int, default=64, help="Maximum number of queries per batch.")
+    return parser.parse_args()
+
+def main():
+    """Script to serve skill retrieval over HTTP (POST /retrieve, GET /health)."""
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    service = SkillRetrievalService(store_dir=args.store_dir)
+    server = RetrievalServer(
+        service,
+        host=args.host,
+        port=args.port,
+        batch_window=args.batch_window_ms / 1000,
+        max_batch_size=args.max_batch_size,
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\nStopping skill retrieval API.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from src.services.vector_store import Skill, VectorStore, top_k_indices
+
+
+def _normalize(vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(norms, np.finfo(np.float32).tiny)[:, None]
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over a VectorStore.
+
+    Skills are clustered with spherical k-means into `nlist` cells and a query only
+    scores the skills in its `nprobe` closest cells. Raising `nprobe` trades latency
+    for recall (nprobe == nlist is exact search). Stores smaller than `min_size`
+    are searched exactly, the index is trained the first time the store crosses
+    that size and retrained once it has grown by `retrain_growth`. Rows appended to
+    the store after training are assigned to their nearest cell incrementally.
+    """
+    def __init__(
+        self,
+        store: VectorStore,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        min_size: int = 2048,
+        train_iters: int = 10,
+        train_sample: int = 256,
+        retrain_growth: float = 4.0,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            store: VectorStore - The vector DB to index
+            nlist: Optional[int] - Number of cells, defaults to ~4 * sqrt(store size) at training time
+            nprobe: int - Number of cells scored per query
+            min_size: int - Below this many skills, search is brute force
+            train_iters: int - k-means iterations
+            train_sample: int - k-means is trained on at most train_sample * nlist rows
+            retrain_growth: float - Retrain once the store is this many times larger than at training time
+            seed: int - Seed for the training sample and centroid initialization
+        """
+        self.store = store
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_size = min_size
+        self.train_iters = train_iters
+        self.train_sample = train_sample
+        self.retrain_growth = retrain_growth
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+        self._indexed = 0
+        self._trained_size = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _assign(self, vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        return np.argmax(_normalize(vectors, norms) @ self.centroids.T, axis=1)
+
+    def train(self):
+        """Cluster the store with spherical k-means and rebuild all inverted lists"""
+        n = len(self.store)
+        nlist = min(self.nlist or max(1, int(4 * np.sqrt(n))), n)
+        rng = np.random.default_rng(self.seed)
+
+        sample_size = min(n, self.train_sample * nlist)
+        sample_rows = np.sort(rng.choice(n, size=sample_size, replace=False))
+        sample = _normalize(self.store.vectors(sample_rows), self.store.norms[sample_rows])
+
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)]
+        for _ in range(self.train_iters):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+            # empty cells keep their previous centroid
+            sums[counts == 0] = centroids[counts == 0]
+            centroids = _normalize(sums, np.linalg.norm(sums, axis=1))
+        self.centroids = centroids
+
+        self._lists = [[] for _ in range(nlist)]
+        self._list_arrays = [None] * nlist
+        self._indexed = 0
+        self._trained_size = n
+        self.sync()
+
+    def sync(self):
+        """Train if needed and assign any rows appended to the store since the last call"""
+        n = len(self.store)
+        if n < self.min_size:
+            return
+        if not self.is_trained or n >= self._trained_size * self.retrain_growth:
+            self.train()
+            return
+        if self._indexed == n:
+            return
+        rows = np.arange(self._indexed, n)
+        assignments = self._assign(self.store.vectors(rows), self.store.norms[rows])
+        for row, cell in zip(rows.tolist(), assignments.tolist()):
+            self._lists[cell].append(row)
+            self._list_arrays[cell] = None
+        self._indexed = n
+
+    def _cell_rows(self, cell: int) -> np.ndarray:
+        if self._list_arrays[cell] is None:
+            self._list_arrays[cell] = np.asarray(self._lists[cell], dtype=np.int64)
+        return self._list_arrays[cell]
+
+    def search_ids_batch(self, query_embeddings: Sequence[Sequence[float]], top_n: int = 10) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Approximate search returning (row ids, similarities) per query, best first"""
+        self.sync()
+        if not self.is_trained:
+            return self.store.search_ids_batch(query_embeddings, top_n)
+
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = top_k_indices(queries @ self.centroids.T, nprobe)
+
+        results = []
+        for query, cells in zip(queries, probes):
+            rows = np.concatenate([self._cell_rows(cell) for cell in cells])
+            if len(rows) == 0:
+                results.append((rows, np.empty(0, dtype=np.float32)))
+                continue
+            scores = self.store.scores(query, rows=rows)[0]
+            results.append(self.store.select(query, scores, top_n, rows=rows))
+        return results
+
+    def search(self, query_embedding: Sequence[float], top_n: int = 10) -> List[Tuple[Skill, float]]:
+        return self.search_batch([query_embedding], top_n)[0]
+
+    def search_batch(self, query_embeddings: Sequence[Sequence[float]], top_n: int = 10) -> List[List[Tuple[Skill, float]]]:
+        return [self.store.hits(ids, scores) for ids, scores in self.search_ids_batch(query_embeddings, top_n)]
+
+
+def recall_at_k(index, query_embeddings: Sequence[Sequence[float]], k: int = 10, reference: Optional[VectorStore] = None) -> float:
+    """Fraction of the exact top-k neighbours that `index` also returns in its top-k.
+
+    `index` is anything with search_ids_batch (an ANN index or a quantized VectorStore).
+    The exact neighbours come from `reference`, a float32 VectorStore holding the
+    same rows, defaulting to index.store. tests/test_ann_recall.py asserts it on
+    isotropic Gaussian embeddings, src/scripts/check_ann_recall.py reports it on
+    clustered ones.
+    """
+    reference = reference if reference is not None else index.store
+    exact = reference.search_ids_batch(query_embeddings, k)
+    approx = index.search_ids_batch(query_embeddings, k)
+    found = sum(len(np.intersect1d(e, a)) for (e, _), (a, _) in zip(exact, approx))
+    expected = sum(len(e) for e, _ in exact)
+    return found / expected if expected else 1.0
+
+
+INDEX_TYPES = {
+    "ivf": IVFIndex,
+}
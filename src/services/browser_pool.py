@@ -0,0 +1,312 @@
+from typing import Dict, List, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import logging
+import time
+
+from playwright.sync_api import Browser, BrowserContext, Error as PlaywrightError, Page, sync_playwright
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PooledContext:
+    """A browser context of the pool, with the page it hands out"""
+    context: BrowserContext
+    page: Page
+    browser: Browser
+    # storage state file the context was seeded with, None for a blank session
+    state_key: Optional[str]
+    uses: int = 0
+    created: float = field(default_factory=time.time)
+
+
+class BrowserPool:
+    """Pre-launched Chromium browsers handing out ready, authenticated pages.
+
+    Launching a browser takes seconds, creating a context in a running one a few
+    tens of milliseconds. The pool launches `num_browsers` browsers up front and
+    hands out isolated contexts seeded with a site's storage state (auth.json),
+    which is read from disk once and kept in memory. Released contexts stay warm
+    for the next request with the same storage state and are recycled after
+    `max_context_uses` hand-outs; before a context is handed out again it is
+    health-checked and replaced if its page or browser died.
+
+    BrowserGym environments launch and close a browser at every reset. After
+    `install_for_browsergym`, those launches borrow a running browser of the pool
+    with the same launch options instead, and closing it only closes the contexts
+    the environment opened in it.
+
+    Playwright's sync API is bound to the thread that started it, so a pool must
+    be used from a single thread. Use one pool per worker process or thread.
+    """
+    def __init__(self, num_browsers: int = 1, max_context_uses: int = 20, max_idle_contexts: int = 4, headless: bool = True, launch_options: Optional[dict] = None):
+        self.num_browsers = num_browsers
+        self.max_context_uses = max_context_uses
+        self.max_idle_contexts = max_idle_contexts
+        self.headless = headless
+        self.launch_options = launch_options or {}
+        self._playwright = None
+        self.browsers: List[Browser] = []
+        # warm contexts by storage state, most recently released last
+        self._idle: Dict[Optional[str], List[PooledContext]] = {}
+        self._leased: Dict[int, PooledContext] = {}
+        self._states: Dict[str, dict] = {}
+        # browsers lent to BrowserGym environments and given back, by launch options
+        self._lendable: Dict[str, List[Browser]] = {}
+        self._installed = False
+        self._state_mtimes: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _start_playwright(self):
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+
+    def start(self) -> "BrowserPool":
+        self._start_playwright()
+        while len(self.browsers) < self.num_browsers:
+            self.browsers.append(self._launch())
+        return self
+
+    def __enter__(self) -> "BrowserPool":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _launch(self) -> Browser:
+        start = time.perf_counter()
+        browser = self._playwright.chromium.launch(headless=self.headless, **self.launch_options)
+        logger.info("Launched browser in %.2fs", time.perf_counter() - start)
+        return browser
+
+    def storage_state(self, path: str) -> dict:
+        """Storage state of an auth.json, read again only when the file changes"""
+        key = str(Path(path).resolve())
+        mtime = Path(key).stat().st_mtime
+        if self._state_mtimes.get(key) != mtime:
+            with open(key, 'r') as f:
+                self._states[key] = json.load(f)
+            self._state_mtimes[key] = mtime
+        return self._states[key]
+
+    def _browser(self) -> Browser:
+        """The live browser with the fewest contexts, relaunching dead ones"""
+        for i, browser in enumerate(self.browsers):
+            if not browser.is_connected():
+                logger.warning("Browser %d disconnected, relaunching it", i)
+                self._drop_browser(browser)
+                self.browsers[i] = self._launch()
+        return min(self.browsers, key=lambda browser: len(browser.contexts))
+
+    def _drop_browser(self, browser: Browser):
+        for key, pooled in self._idle.items():
+            self._idle[key] = [entry for entry in pooled if entry.browser is not browser]
+
+    def _new_context(self, state_key: Optional[str]) -> PooledContext:
+        browser = self._browser()
+        storage_state = self.storage_state(state_key) if state_key else None
+        context = browser.new_context(storage_state=storage_state)
+        return PooledContext(context=context, page=context.new_page(), browser=browser, state_key=state_key)
+
+    @staticmethod
+    def healthy(pooled: PooledContext) -> bool:
+        if not pooled.browser.is_connected() or pooled.page.is_closed():
+            return False
+        try:
+            return pooled.page.evaluate("1") == 1
+        except PlaywrightError:
+            return False
+
+    def _discard(self, pooled: PooledContext):
+        try:
+            pooled.context.close()
+        except PlaywrightError:
+            pass
+
+    def warm(self, storage_state: Optional[str] = None, count: int = 1):
+        """Create `count` idle contexts for a storage state ahead of the first request"""
+        self.start()
+        state_key = str(Path(storage_state).resolve()) if storage_state else None
+        idle = self._idle.setdefault(state_key, [])
+        while len(idle) < min(count, self.max_idle_contexts):
+            idle.append(self._new_context(state_key))
+
+    def acquire(self, storage_state: Optional[str] = None, url: Optional[str] = None) -> PooledContext:
+        """A healthy context seeded with `storage_state`, its page opened on `url` if given"""
+        self.start()
+        state_key = str(Path(storage_state).resolve()) if storage_state else None
+        idle = self._idle.get(state_key, [])
+        pooled = None
+        while idle:
+            candidate = idle.pop()
+            if self.healthy(candidate):
+                pooled = candidate
+                self.hits += 1
+                break
+            logger.info("Discarding unhealthy pooled context")
+            self._discard(candidate)
+        if pooled is None:
+            self.misses += 1
+            pooled = self._new_context(state_key)
+        pooled.uses += 1
+        self._leased[id(pooled)] = pooled
+        if url:
+            pooled.page.goto(url)
+        return pooled
+
+    def release(self, pooled: PooledContext, save_state: bool = False):
+        """Return a context to the pool, or close it if it's worn out or broken.
+
+        With `save_state`, the context's current cookies and local storage replace the
+        cached storage state, so refreshed sessions carry over to the next contexts.
+        """
+        self._leased.pop(id(pooled), None)
+        if save_state and pooled.state_key and self.healthy(pooled):
+            self._states[pooled.state_key] = pooled.context.storage_state()
+        idle = self._idle.setdefault(pooled.state_key, [])
+        if pooled.uses >= self.max_context_uses or len(idle) >= self.max_idle_contexts or not self.healthy(pooled):
+            self._discard(pooled)
+            return
+        try:
+            # keep one page, back on a blank document
+            for page in pooled.context.pages:
+                if page is not pooled.page:
+                    page.close()
+            pooled.page.goto("about:blank")
+        except PlaywrightError as e:
+            logger.info("Discarding pooled context that failed to reset: %s", e)
+            self._discard(pooled)
+            return
+        idle.append(pooled)
+
+    @contextmanager
+    def page(self, storage_state: Optional[str] = None, url: Optional[str] = None, save_state: bool = False):
+        """Context manager handing out a ready page and returning its context to the pool"""
+        pooled = self.acquire(storage_state, url)
+        try:
+            yield pooled.page
+        finally:
+            self.release(pooled, save_state=save_state)
+
+    def lend_browser(self, **launch_options) -> "LentBrowser":
+        """A running browser launched with `launch_options`, to give back with its close()"""
+        self._start_playwright()
+        key = json.dumps(launch_options, sort_keys=True, default=str)
+        idle = self._lendable.setdefault(key, [])
+        while idle:
+            browser = idle.pop()
+            if browser.is_connected():
+                self.hits += 1
+                return LentBrowser(self, key, browser)
+        self.misses += 1
+        start = time.perf_counter()
+        browser = self._playwright.chromium.launch(**launch_options)
+        logger.info("Launched browser in %.2fs", time.perf_counter() - start)
+        return LentBrowser(self, key, browser)
+
+    def _give_back(self, key: str, browser: Browser):
+        idle = self._lendable.setdefault(key, [])
+        if browser.is_connected() and len(idle) < self.num_browsers:
+            idle.append(browser)
+            return
+        try:
+            browser.close()
+        except PlaywrightError:
+            pass
+
+    def install_for_browsergym(self) -> "BrowserPool":
+        """Serve the browsers BrowserGym environments launch in this process from the pool"""
+        from browsergym.core import _get_global_playwright, _set_global_playwright
+
+        self._start_playwright()
+        if not isinstance(_get_global_playwright(), _PooledPlaywright):
+            _set_global_playwright(_PooledPlaywright(self))
+        self._installed = True
+        return self
+
+    def close(self):
+        for pooled in [entry for idle in self._idle.values() for entry in idle] + list(self._leased.values()):
+            self._discard(pooled)
+        self._idle = {}
+        self._leased = {}
+        for browser in self.browsers:
+            try:
+                browser.close()
+            except PlaywrightError:
+                pass
+        self.browsers = []
+        for browsers in self._lendable.values():
+            for browser in browsers:
+                try:
+                    browser.close()
+                except PlaywrightError:
+                    pass
+        self._lendable = {}
+        if self._installed:
+            from browsergym.core import _set_global_playwright
+
+            # BrowserGym starts a plain Playwright again if an environment needs one
+            _set_global_playwright(None)
+            self._installed = False
+        if self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
+
+
+class LentBrowser:
+    """A pool browser lent to a BrowserGym environment.
+
+    It stands in for the Browser the environment would have launched: closing it
+    closes the contexts opened through it and gives the browser back to the pool.
+    """
+    def __init__(self, pool: BrowserPool, key: str, browser: Browser):
+        self._pool = pool
+        self._key = key
+        self._browser = browser
+        self._contexts: List[BrowserContext] = []
+
+    def new_context(self, **kwargs) -> BrowserContext:
+        context = self._browser.new_context(**kwargs)
+        self._contexts.append(context)
+        return context
+
+    def close(self, **kwargs):
+        if self._browser is None:
+            return
+        for context in self._contexts:
+            try:
+                context.close()
+            except PlaywrightError:
+                pass
+        self._contexts = []
+        self._pool._give_back(self._key, self._browser)
+        self._browser = None
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+
+class _PooledChromium:
+    """Chromium browser type whose launch() borrows a browser from the pool"""
+    def __init__(self, pool: BrowserPool):
+        self._pool = pool
+
+    def launch(self, **launch_options) -> LentBrowser:
+        return self._pool.lend_browser(**launch_options)
+
+    def __getattr__(self, name):
+        return getattr(self._pool._playwright.chromium, name)
+
+
+class _PooledPlaywright:
+    """The pool's Playwright instance, with its chromium launches served by the pool"""
+    def __init__(self, pool: BrowserPool):
+        self._pool = pool
+        self.chromium = _PooledChromium(pool)
+
+    def __getattr__(self, name):
+        return getattr(self._pool._playwright, name)
@@ -0,0 +1,79 @@
+from typing import Callable, List, Optional, Sequence
+from collections import OrderedDict
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+from src.utils.disk_cache import DiskCache
+
+EmbedFn = Callable[[List[str]], np.ndarray]
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a text for cache keys: NFC unicode with collapsed whitespace"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """Content-addressed cache in front of an embedding model.
+
+    Entries are keyed on (model name, sha256 of the normalized text) and live in
+    an in-process LRU tier and, if `path` is given, a persistent size-bounded
+    SQLite tier. Disk hits are promoted into the LRU tier.
+    """
+    def __init__(self, path: Optional[str] = None, max_memory_entries: int = 10000, max_disk_bytes: int = 512 * 1024 * 1024):
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = DiskCache(path, max_bytes=max_disk_bytes) if path else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode()).hexdigest()
+        return f"{model}:{digest}"
+
+    def _remember(self, key: str, embedding: np.ndarray):
+        """Insert into the LRU tier (lock must be held)"""
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def embed(self, model: str, texts: Sequence[str], embed_fn: EmbedFn) -> np.ndarray:
+        """Return a (len(texts), dim) float32 matrix, calling embed_fn once for all distinct misses"""
+        keys = [self.key(model, text) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.disk is not None:
+            for key, value in self.disk.get_many(missing).items():
+                found[key] = np.frombuffer(value, dtype=np.float32)
+            with self._lock:
+                for key in missing:
+                    if key in found:
+                        self._remember(key, found[key])
+            missing = [key for key in missing if key not in found]
+
+        if missing:
+            first_text = {}
+            for key, text in zip(keys, texts):
+                first_text.setdefault(key, text)
+            embeddings = np.asarray(embed_fn([first_text[key] for key in missing]), dtype=np.float32)
+            with self._lock:
+                for key, embedding in zip(missing, embeddings):
+                    found[key] = embedding
+                    self._remember(key, embedding)
+            if self.disk is not None:
+                self.disk.put_many((key, embedding.tobytes()) for key, embedding in zip(missing, embeddings))
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+        return np.stack([found[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
@@ -0,0 +1,222 @@
+from typing import Dict, List, Sequence, Tuple, Union
+from collections import Counter
+from pathlib import Path
+import math
+import os
+import re
+import numpy as np
+from src.services.vector_store import Skill, VectorStore, top_k_indices
+
+_WORD = re.compile(r'[A-Za-z0-9]+')
+_CAMEL = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+# string literals in skill code, i.e. Playwright locators like get_by_role("link", name="Compustat - Capital IQ")
+_STRING_LITERAL = re.compile(r'"((?:[^"\\\n]|\\.)*)"|\'((?:[^\'\\\n]|\\.)*)\'')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, with snake_case and camelCase identifiers also split into their parts"""
+    tokens = []
+    for word in _WORD.findall(text):
+        lowered = word.lower()
+        tokens.append(lowered)
+        parts = _CAMEL.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    # identifiers like set_date_range are matched both whole and by part
+    for identifier in re.findall(r'[A-Za-z0-9]+(?:_[A-Za-z0-9]+)+', text):
+        tokens.append(identifier.lower())
+    return tokens
+
+
+def locator_strings(code: str) -> List[str]:
+    return [double or single for double, single in _STRING_LITERAL.findall(code)]
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring over the skills of a VectorStore.
+
+    Indexed fields are the skill name, its description/docstring/signature and the
+    string literals (Playwright locators) in its code, each with a weight applied
+    to its term frequencies. Document ids are the store's row ids so lexical and
+    vector results can be fused, and rows appended to the store are indexed
+    incrementally on search. Queries need no embedding call. Any object with a
+    `skills` sequence can stand in for the store when results aren't fused.
+
+    Postings live in compact CSR arrays (term -> doc ids, term frequencies) that
+    `save` writes next to a persistent store and `load` maps back without
+    re-tokenizing any skill; documents indexed since are kept in `postings` until
+    the next `compact`.
+    """
+    FIELD_WEIGHTS = {
+        "name": 3.0,
+        "signature": 1.0,
+        "description": 1.0,
+        "docstring": 1.0,
+        "code": 1.0,
+    }
+    FILE = "bm25.npz"
+
+    def __init__(self, store: VectorStore, k1: float = 1.2, b: float = 0.75):
+        self.store = store
+        self.k1 = k1
+        self.b = b
+        # compacted postings: the postings of term t are _doc_ids/_tfs[_offsets[t]:_offsets[t + 1]]
+        self._terms: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._doc_ids = np.empty(0, dtype=np.int64)
+        self._tfs = np.empty(0, dtype=np.float32)
+        # postings of documents indexed since the last compact
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.doc_lengths = np.empty(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def _term_frequencies(self, skill: Skill) -> Counter:
+        frequencies = Counter()
+        for field, weight in self.FIELD_WEIGHTS.items():
+            value = skill.get(field)
+            if not value:
+                continue
+            text = " ".join(locator_strings(value)) if field == "code" else str(value)
+            for token in tokenize(text):
+                frequencies[token] += weight
+        return frequencies
+
+    def sync(self):
+        """Index any skills appended to the store since the last call, reading them in one sequential pass"""
+        start, stop = len(self.doc_lengths), len(self.store.skills)
+        if start >= stop:
+            return
+        skills = self.store.skills
+        records = skills.iter_range(start, stop) if hasattr(skills, "iter_range") else skills[start:stop]
+        lengths = []
+        for doc_id, skill in enumerate(records, start):
+            frequencies = self._term_frequencies(skill)
+            for token, tf in frequencies.items():
+                self.postings.setdefault(token, {})[doc_id] = tf
+            lengths.append(sum(frequencies.values()))
+        self.doc_lengths = np.concatenate([self.doc_lengths, np.asarray(lengths, dtype=np.float32)])
+
+    def compact(self):
+        """Merge the postings of recently indexed documents into the CSR arrays"""
+        if not self.postings:
+            return
+        terms, doc_ids, tfs = [], [], []
+        for token, postings in self.postings.items():
+            term = self._terms.setdefault(token, len(self._terms))
+            terms.append(np.full(len(postings), term, dtype=np.int64))
+            doc_ids.append(np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)))
+            tfs.append(np.fromiter(postings.values(), dtype=np.float32, count=len(postings)))
+        old_terms = np.repeat(np.arange(len(self._offsets) - 1, dtype=np.int64), np.diff(self._offsets))
+        all_terms = np.concatenate([old_terms] + terms)
+        # stable, so each term keeps its compacted postings before the new ones
+        order = np.argsort(all_terms, kind="stable")
+        self._doc_ids = np.concatenate([self._doc_ids] + doc_ids)[order]
+        self._tfs = np.concatenate([self._tfs] + tfs)[order]
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(all_terms, minlength=len(self._terms)))]).astype(np.int64)
+        self.postings = {}
+
+    def save(self, path: Union[str, Path]):
+        """Index any new skills and atomically write the postings to `path`"""
+        self.sync()
+        self.compact()
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                terms=np.array(list(self._terms), dtype=str),
+                offsets=self._offsets,
+                doc_ids=self._doc_ids,
+                tfs=self._tfs,
+                doc_lengths=self.doc_lengths,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, store: VectorStore, path: Union[str, Path], **kwargs) -> "BM25Index":
+        """Index saved at `path`, or an empty one if it is missing, unreadable or covers rows the store no longer has"""
+        index = cls(store, **kwargs)
+        if not Path(path).exists():
+            return index
+        try:
+            with np.load(path) as data:
+                doc_lengths = data["doc_lengths"]
+                if len(doc_lengths) > len(store):
+                    return index
+                index._terms = {token: term for term, token in enumerate(data["terms"].tolist())}
+                index._offsets = data["offsets"]
+                index._doc_ids = data["doc_ids"]
+                index._tfs = data["tfs"]
+                index.doc_lengths = doc_lengths
+        except Exception as e:
+            print(f"Ignoring unreadable BM25 index {path}: {e}")
+            return cls(store, **kwargs)
+        return index
+
+    def _term_postings(self, token: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc ids, term frequencies) of a token, compacted and recent"""
+        doc_ids, tfs = [], []
+        term = self._terms.get(token)
+        if term is not None:
+            start, end = self._offsets[term], self._offsets[term + 1]
+            doc_ids.append(self._doc_ids[start:end])
+            tfs.append(self._tfs[start:end])
+        recent = self.postings.get(token)
+        if recent:
+            doc_ids.append(np.fromiter(recent.keys(), dtype=np.int64, count=len(recent)))
+            tfs.append(np.fromiter(recent.values(), dtype=np.float32, count=len(recent)))
+        if not doc_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return np.concatenate(doc_ids), np.concatenate(tfs)
+
+    def score_ids(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc ids, BM25 scores) of every document sharing at least one token with the query"""
+        self.sync()
+        n = len(self.doc_lengths)
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        avg_length = float(self.doc_lengths.mean()) or 1.0
+        scores = np.zeros(n, dtype=np.float32)
+        matched = np.zeros(n, dtype=bool)
+        for token in set(tokenize(query)):
+            doc_ids, tfs = self._term_postings(token)
+            if len(doc_ids) == 0:
+                continue
+            idf = math.log(1 + (n - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_ids] / avg_length)
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+            matched[doc_ids] = True
+        ids = np.flatnonzero(matched)
+        return ids, scores[ids]
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """BM25 score of every document sharing at least one token with the query"""
+        ids, values = self.score_ids(query)
+        return dict(zip(ids.tolist(), values.tolist()))
+
+    def search_ids(self, query: str, top_n: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row ids, BM25 scores) of the best matching skills, best first"""
+        ids, values = self.score_ids(query)
+        if len(ids) == 0:
+            return ids, values
+        best = top_k_indices(values, top_n)
+        return ids[best], values[best]
+
+    def search(self, query: str, top_n: int = 10) -> List[Tuple[Skill, float]]:
+        return self.store.hits(*self.search_ids(query, top_n))
+
+
+def reciprocal_rank_fusion(rankings: Sequence[np.ndarray], top_n: int = 10, k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """Fuse ranked lists of ids, scoring each id by sum(1 / (k + rank)) over the lists it appears in"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking.tolist()):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    if not fused:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    ids = np.fromiter(fused.keys(), dtype=np.int64, count=len(fused))
+    values = np.fromiter(fused.values(), dtype=np.float32, count=len(fused))
+    best = top_k_indices(values, top_n)
+    return ids[best], values[best]
@@ -0,0 +1,227 @@
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import logging
+import time
+
+from src.services.skill_retrieval_service import SkillRetrievalService
+from src.utils.data import get_base_url
+
+logger = logging.getLogger(__name__)
+
+QueryKey = Tuple[str, str, int, str]
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class RetrievalServer:
+    """Asyncio HTTP API in front of a SkillRetrievalService.
+
+    Concurrent queries arriving within `batch_window` seconds of each other are
+    micro-batched into one retrieve_batch call (one embedding call and one matrix
+    scoring pass per tool), and identical queries already in flight share a single
+    result. The service runs on one worker thread so the event loop never blocks
+    on embedding or scoring and the service itself is never used concurrently.
+
+    Endpoints:
+        POST /retrieve  {"url": ..., "text": ..., "top_n": 10, "mode": "hybrid"}
+                        or {"queries": [{"url": ..., "text": ...}, ...], "top_n": ..., "mode": ...}
+        GET  /health
+    """
+    MAX_BODY_BYTES = 1024 * 1024
+
+    def __init__(
+        self,
+        service: SkillRetrievalService,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        batch_window: float = 0.005,
+        max_batch_size: int = 64,
+    ):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="skill-retrieval")
+        self._queue: Optional[asyncio.Queue] = None
+        self._in_flight: Dict[QueryKey, asyncio.Future] = {}
+        self._batcher: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.stats = {"requests": 0, "queries": 0, "coalesced": 0, "batches": 0}
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info("Skill retrieval API listening on http://%s:%d", self.host, self.port)
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher:
+            self._batcher.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def retrieve(self, query: Dict[str, str], top_n: int = 10, mode: str = "hybrid") -> List[Tuple[Dict[str, Any], float]]:
+        """Queue a query for the next micro-batch, or join an identical query already in flight"""
+        if mode not in SkillRetrievalService.RETRIEVAL_MODES:
+            raise HTTPError(400, f"Unknown retrieval mode {mode!r}")
+        try:
+            key = (get_base_url(query["url"]), query["text"], int(top_n), mode)
+        except (KeyError, TypeError, ValueError) as e:
+            raise HTTPError(400, f"Invalid query {query!r}: {e!r}")
+
+        self.stats["queries"] += 1
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[key] = future
+            self._queue.put_nowait((key, future))
+        return await asyncio.shield(future)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch: List[Tuple[QueryKey, asyncio.Future]]):
+        # retrieve_batch takes one top_n and mode, so split the batch on those
+        groups: Dict[Tuple[int, str], List[Tuple[QueryKey, asyncio.Future]]] = {}
+        for key, future in batch:
+            groups.setdefault(key[2:], []).append((key, future))
+
+        loop = asyncio.get_running_loop()
+        for (top_n, mode), items in groups.items():
+            queries = [{"url": key[0], "text": key[1]} for key, _ in items]
+            self.stats["batches"] += 1
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, lambda: self.service.retrieve_batch(queries, top_n=top_n, mode=mode)
+                )
+            except Exception as e:
+                results = None
+                error = e
+            for i, (key, future) in enumerate(items):
+                self._in_flight.pop(key, None)
+                if future.done():
+                    continue
+                if results is None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[i])
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, headers, body = await self._read_request(request_line, reader)
+                start = time.perf_counter()
+                try:
+                    status, payload = 200, await self._dispatch(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    logger.exception("Error handling %s %s", method, path)
+                    status, payload = 500, {"error": repr(e)}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                logger.debug("%s %s -> %d in %.1fms", method, path, status, (time.perf_counter() - start) * 1000)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except HTTPError as e:
+            self._write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, request_line: bytes, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        try:
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > self.MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Dict[str, Any]:
+        if path == "/health":
+            return {"status": "ok", "tools": {url: len(store) for url, store in self.service.vector_dbs.items()}, **self.stats}
+        if path != "/retrieve":
+            raise HTTPError(404, f"Unknown path {path}")
+        if method != "POST":
+            raise HTTPError(405, "Use POST /retrieve")
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON: {e}")
+        if not isinstance(request, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        if "queries" in request and not (isinstance(request["queries"], list) and all(isinstance(query, dict) for query in request["queries"])):
+            raise HTTPError(400, "queries must be a list of JSON objects")
+
+        self.stats["requests"] += 1
+        top_n = request.get("top_n", 10)
+        mode = request.get("mode", "hybrid")
+        if "queries" in request:
+            results = await asyncio.gather(*(self.retrieve(query, top_n, mode) for query in request["queries"]))
+            return {"results": [self._format(hits) for hits in results]}
+        return {"results": self._format(await self.retrieve(request, top_n, mode))}
+
+    @staticmethod
+    def _format(hits: List[Tuple[Dict[str, Any], float]]) -> List[Dict[str, Any]]:
+        return [{"skill": skill, "score": score} for skill, score in hits]
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], keep_alive: bool):
+        body = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode() + body)
@@ -1,49 +1,283 @@
-from typing import Dict, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+import time
 import ollama
 import numpy as np
+from src.services.ann_index import INDEX_TYPES
+from src.services.embedding_cache import EmbeddingCache
+from src.services.lexical_index import BM25Index, reciprocal_rank_fusion
+from src.services.vector_store import PersistentVectorStore, VectorStore, open_persistent_stores
 from src.utils.data import get_base_url
 
+@dataclass
+class IngestionError:
+    index: int
+    skill: Any
+    error: str
+
+@dataclass
+class IngestionReport:
+    added: int = 0
+    errors: List[IngestionError] = field(default_factory=list)
+    batches: int = 0
+    seconds: float = 0.0
+    # skills tombstoned because their workflow file changed or was deleted
+    removed: int = 0
+    # workflow files that could not be parsed, path -> error
+    failed_files: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def skills_per_second(self) -> float:
+        return self.added / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f"Ingested {self.added} skills in {self.batches} batches ({self.seconds:.2f}s, "
+                f"{self.skills_per_second:.1f} skills/s), {len(self.errors)} errors, "
+                f"{self.removed} removed, {len(self.failed_files)} unparsable files")
+
 class SkillRetrievalService:
     """TODO: this is not currently being used but we may want to draw from this starter RAG implementation later on"""
-    def __init__(self):
+    def __init__(
+        self,
+        store_dir: Optional[str] = None,
+        index_configs: Optional[Dict[str, Dict[str, Any]]] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        quantization: str = "float32",
+        keep_float32: bool = False,
+        rerank: int = 4,
+        fusion_candidates: int = 3,
+    ):
+        """
+        Args:
+            store_dir: Optional[str] - Directory of persistent vector DBs. When set, existing DBs are
+                memory-mapped on startup and new skills are appended to disk instead of only living in memory.
+            index_configs: Optional[Dict[str, Dict[str, Any]]] - Per base URL ANN index config, e.g.
+                {"https://wrds-www.wharton.upenn.edu/": {"type": "ivf", "nprobe": 16}}. Tools without a config use exact search.
+            embedding_cache: Optional[EmbeddingCache] - Cache shared by ingestion and queries. Defaults to an
+                in-memory cache, plus an on-disk tier under store_dir when that is set.
+            quantization: str - Storage of new vector dbs: "float32", "float16" or "int8" (per-vector scaled)
+            keep_float32: bool - Keep float32 copies of quantized in-memory vectors to re-rank the top rerank * top_n
+                candidates. Persistent stores always keep them on disk.
+            rerank: int - Re-rank factor for quantized stores with float32 vectors available, 1 disables re-ranking
+            fusion_candidates: int - In hybrid retrieval, each ranking contributes its top fusion_candidates * top_n skills
+        """
         self.embedding_model = 'hf.co/CompendiumLabs/bge-base-en-v1.5-gguf'
-        # dict of in-memory vector dbs
-        self.vector_dbs = {}
-    
-    def _cosine_similarity(self, a, b):
-        dot_prod = np.dot(a, b)
-        norm_a = sum([x ** 2 for x in a]) ** 0.5
-        norm_b = sum([x ** 2 for x in b]) ** 0.5
-        return dot_prod / (norm_a * norm_b)
-    
-    def add_skill_to_db(self, skill: Tuple[Dict[str, str]]):
+        self.store_dir = Path(store_dir) if store_dir else None
+        self.quantization = quantization
+        self.keep_float32 = keep_float32
+        self.rerank = rerank
+        self.fusion_candidates = fusion_candidates
+        if embedding_cache is None:
+            embedding_cache = EmbeddingCache(str(self.store_dir / "embedding_cache.sqlite") if self.store_dir else None)
+        self.embedding_cache = embedding_cache
+        # dict of vector dbs, one per tool base URL
+        self.vector_dbs: Dict[str, VectorStore] = open_persistent_stores(self.store_dir, rerank=self.rerank) if self.store_dir else {}
+        # optional approximate nearest-neighbour indexes over some of the vector dbs
+        self.indexes = {}
+        for base_url, config in (index_configs or {}).items():
+            self.configure_index(base_url, **config)
+        # BM25 indexes over the same skills, persisted at ingest for on-disk stores and otherwise built on the first lexical or hybrid query
+        self.lexical_indexes: Dict[str, BM25Index] = {}
+
+    # skill fields that are bookkeeping rather than text worth embedding
+    NON_TEXT_FIELDS = ("url", "body_hash", "session_id")
+
+    def _skill_text(self, skill: Dict[str, Any]) -> str:
+        """Text that gets embedded for a skill"""
+        # right now this means we're actually embedding the DOM actions— we might want to just embed description and url
+        return "\n".join(str(value) for key, value in skill.items() if key not in self.NON_TEXT_FIELDS and value)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a list of texts, with a single ollama call for the ones not already cached"""
+        return self.embedding_cache.embed(self.embedding_model, texts, self._embed_uncached)
+
+    def _embed_uncached(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(ollama.embed(model=self.embedding_model, input=texts)['embeddings'], dtype=np.float32)
+
+    def _get_store(self, base_url: str) -> VectorStore:
+        if base_url not in self.vector_dbs:
+            if self.store_dir:
+                directory = self.store_dir / PersistentVectorStore.directory_name(base_url)
+                self.vector_dbs[base_url] = PersistentVectorStore(directory, base_url=base_url, quantization=self.quantization, rerank=self.rerank)
+            else:
+                self.vector_dbs[base_url] = VectorStore(quantization=self.quantization, keep_float32=self.keep_float32, rerank=self.rerank)
+        return self.vector_dbs[base_url]
+
+    def configure_index(self, url: str, type: str = "ivf", **params):
+        """Serve retrieval for the tool at `url` from an ANN index (see ann_index.IVFIndex for params)"""
+        if type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {type!r}, expected one of {list(INDEX_TYPES)}")
+        base_url = get_base_url(url)
+        self.indexes[base_url] = INDEX_TYPES[type](self._get_store(base_url), **params)
+
+    def add_skill_to_db(self, skill: Dict[str, Any]):
         """
         Args:
-            skill: Tuple[Dict[str, str]] - The skill to be embedding in the format ("description": <description>, ") ... let's fix this type
+            skill: Dict[str, Any] - The skill to be embedded, e.g. {"url": <url>, "name": <name>, "description": <description>, ...}
         """
         try:
-            embedding = ollama.embed(model=self.embedding_model, input=skill)['embeddings'][0]
-            # right now this means we're actually embedding the DOM actions— we might want to just embed description and url
-            self.vector_dbs[get_base_url(skill["url"])].append((skill, embedding))
+            embedding = self._embed([self._skill_text(skill)])[0]
+            self._get_store(get_base_url(skill["url"])).add(skill, embedding)
         except Exception as e:
             print(f"Error embedding skill: {e}")
 
-    def retrieve(self, query: Dict[str, str], top_n=10):
+    def _batches(self, skills: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+        numbered = enumerate(skills)
+        while batch := list(islice(numbered, batch_size)):
+            yield batch
+
+    def _embed_batch(self, batch: List[Tuple[int, Dict[str, Any]]]) -> Tuple[list, List[IngestionError]]:
+        """Embed one batch, returning ((index, skill, base_url, embedding) rows, per-item errors)"""
+        rows, errors, texts = [], [], []
+        for index, skill in batch:
+            try:
+                base_url, text = get_base_url(skill["url"]), self._skill_text(skill)
+            except Exception as e:
+                errors.append(IngestionError(index, skill, f"Invalid skill: {e!r}"))
+                continue
+            rows.append((index, skill, base_url))
+            texts.append(text)
+        if not rows:
+            return [], errors
+        try:
+            embeddings = list(self._embed(texts))
+        except Exception:
+            # re-embed one at a time so only the offending skills are reported
+            embeddings = []
+            for (index, skill, _), text in zip(rows, texts):
+                try:
+                    embeddings.append(self._embed([text])[0])
+                except Exception as e:
+                    errors.append(IngestionError(index, skill, f"Error embedding skill: {e!r}"))
+                    embeddings.append(None)
+        return [row + (embedding,) for row, embedding in zip(rows, embeddings) if embedding is not None], errors
+
+    def _write_batch(self, rows: list, report: IngestionReport):
+        groups: Dict[str, list] = {}
+        for row in rows:
+            groups.setdefault(row[2], []).append(row)
+        for base_url, group in groups.items():
+            try:
+                self._get_store(base_url).add_batch([row[1] for row in group], [row[3] for row in group])
+                report.added += len(group)
+            except Exception as e:
+                report.errors.extend(IngestionError(row[0], row[1], f"Error storing skill: {e!r}") for row in group)
+
+    def add_skills(self, skills: Iterable[Dict[str, Any]], batch_size: int = 64) -> IngestionReport:
+        """Bulk-ingest skills, embedding the next batch while the current one is written to its store
+        Args:
+            skills: Iterable[Dict[str, Any]] - Skills in the same format as add_skill_to_db
+            batch_size: int - Number of skills embedded per ollama call
+        Returns:
+            IngestionReport with the number of skills added, per-item errors and throughput
+        """
+        report = IngestionReport()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = None
+            for batch in self._batches(skills, batch_size):
+                future = executor.submit(self._embed_batch, batch)
+                if pending is not None:
+                    self._finish_batch(pending, report)
+                pending = future
+            if pending is not None:
+                self._finish_batch(pending, report)
+        self._save_lexical_indexes()
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def _finish_batch(self, future, report: IngestionReport):
+        rows, errors = future.result()
+        report.errors.extend(errors)
+        self._write_batch(rows, report)
+        report.batches += 1
+
+    def remove_skills(self, keys: Iterable[Tuple[str, str, str]]) -> int:
+        """Tombstone the stored skills with the given (url, name, body_hash) keys, returning how many were removed"""
+        wanted: Dict[str, set] = {}
+        for url, name, body_hash in keys:
+            wanted.setdefault(get_base_url(url), set()).add((name, body_hash))
+        removed = 0
+        for base_url, names in wanted.items():
+            store = self.vector_dbs.get(base_url)
+            if store is None:
+                continue
+            rows = [
+                i for i, skill in enumerate(store.skills)
+                if i not in store.removed and (skill.get("name"), skill.get("body_hash")) in names
+            ]
+            store.remove(rows)
+            removed += len(rows)
+        return removed
+
+    RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+
+    def _lexical_index(self, base_url: str) -> BM25Index:
+        if base_url not in self.lexical_indexes:
+            store = self._get_store(base_url)
+            if isinstance(store, PersistentVectorStore):
+                self.lexical_indexes[base_url] = BM25Index.load(store, store.directory / BM25Index.FILE)
+            else:
+                self.lexical_indexes[base_url] = BM25Index(store)
+        return self.lexical_indexes[base_url]
+
+    def _save_lexical_indexes(self):
+        """Index newly ingested skills and persist the BM25 postings next to each on-disk store they were added to"""
+        for base_url, store in self.vector_dbs.items():
+            if not isinstance(store, PersistentVectorStore):
+                continue
+            index = self._lexical_index(base_url)
+            if len(index) < len(store) or index.postings:
+                index.save(store.directory / BM25Index.FILE)
+
+    def retrieve(self, query: Dict[str, str], top_n=10, mode: str = "hybrid") -> List[Tuple[Dict[str, Any], float]]:
         """Retrieve skills similar to query from vector DB
         Args:
             query: Dict[str, str] - Query containing a base URL of a tool (i.e. https://www.slack.com)  and a text description (i.e. "check notifications")
+            mode: str - "vector" (embedding similarity), "lexical" (BM25 over names, docstrings and locators, no embedding call)
+                or "hybrid" (reciprocal rank fusion of both)
+        Returns:
+            List of (skill, score) pairs, best first. Scores are cosine similarities, BM25 scores or fused
+            reciprocal-rank scores depending on the mode.
         """
+        return self.retrieve_batch([query], top_n=top_n, mode=mode)[0]
+
+    def retrieve_batch(self, queries: List[Dict[str, str]], top_n=10, mode: str = "hybrid") -> List[List[Tuple[Dict[str, Any], float]]]:
+        """Retrieve skills for many queries with one embedding call and one matrix product per tool"""
+        if mode not in self.RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}, expected one of {self.RETRIEVAL_MODES}")
+        results = [[] for _ in queries]
         try:
-            query_embedding = ollama.embed(model=self.embedding_model, input=query["text"])['embeddings'][0]
-
-            similarities = []
-            # iterate through the vector DB corresponding to the tool we're retrieving skills for
-            for skill, embedding in self.vector_dbs[get_base_url(query["url"])]:
-                similarity = self._cosine_similarity(query_embedding, embedding)
-                similarities.append((skill, similarity))
-            similarities.sort(lambda x: x[1], reverse=True)
-            return similarities[:top_n]
+            query_embeddings = None if mode == "lexical" else self._embed([query["text"] for query in queries])
+            # fusion needs candidates beyond the final top_n from each ranking
+            candidates = top_n * self.fusion_candidates if mode == "hybrid" else top_n
+
+            # group queries by the vector DB of the tool they're retrieving skills for
+            groups: Dict[str, List[int]] = {}
+            for i, query in enumerate(queries):
+                groups.setdefault(get_base_url(query["url"]), []).append(i)
+
+            for base_url, indices in groups.items():
+                store = self.vector_dbs.get(base_url)
+                if store is None or len(store) == 0:
+                    continue
+                # removed skills are dropped from the hits, so ask for as many extra
+                extra = len(store.removed)
+                vector_ids = [None] * len(indices)
+                if mode != "lexical":
+                    # indexes pick up newly added skills incrementally on search
+                    searcher = self.indexes.get(base_url, store)
+                    vector_ids = searcher.search_ids_batch(query_embeddings[indices], candidates + extra)
+                for i, vector_hits in zip(indices, vector_ids):
+                    if mode == "vector":
+                        ids, scores = vector_hits
+                    else:
+                        lexical_hits = self._lexical_index(base_url).search_ids(queries[i]["text"], candidates + extra)
+                        ids, scores = lexical_hits if mode == "lexical" else reciprocal_rank_fusion([vector_hits[0], lexical_hits[0]], top_n + extra)
+                    results[i] = store.hits(ids, scores)[:top_n]
         except Exception as e:
             print(f"Error retrieving skills from vector DB: {e}")
-
-    
\ No newline at end of file
+        return results
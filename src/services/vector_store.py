@@ -0,0 +1,487 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from pathlib import Path
+import json
+import os
+import re
+import threading
+import numpy as np
+
+Skill = Dict[str, Any]
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores along the last axis, sorted best first.
+
+    Uses argpartition so only the k winners get sorted instead of the whole row.
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+QUANTIZATIONS = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "int8": np.int8,
+}
+
+# rows dequantized at a time when scoring float16/int8 codes, bounds the float32 scratch memory
+SCORE_CHUNK_ROWS = 4096
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Encode float32 rows as (codes, per-row scales). Scales are only used for int8."""
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization!r}, expected one of {list(QUANTIZATIONS)}")
+    if quantization != "int8":
+        return vectors.astype(QUANTIZATIONS[quantization]), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, np.finfo(np.float32).tiny).astype(np.float32)
+    codes = np.clip(np.round(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class VectorStore:
+    """In-memory vector DB for the skills of a single tool (base URL).
+
+    Embeddings live in one contiguous matrix that grows by doubling, and their L2
+    norms are computed once at insert time, so a query is a single matrix-vector
+    product and a batch of queries a single matrix-matrix product.
+
+    With quantization="float16" or "int8" (per-row scaled) the matrix holds the
+    quantized codes and scoring runs on them directly. If float32 vectors are also
+    kept (keep_float32=True), the top rerank * top_n candidates are re-scored
+    exactly before the final top_n is returned.
+
+    Rows are never deleted: `remove` tombstones them and `hits` leaves them out, so
+    searches should ask for `len(removed)` extra candidates.
+    """
+    def __init__(self, initial_capacity: int = 64, quantization: str = "float32", keep_float32: bool = False, rerank: int = 4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}, expected one of {list(QUANTIZATIONS)}")
+        self.skills: List[Skill] = []
+        self.quantization = quantization
+        self.keep_float32 = keep_float32 and quantization != "float32"
+        self.rerank = rerank
+        self._initial_capacity = initial_capacity
+        self._codes = None
+        self._scales = None
+        self._norms = None
+        self._exact = None
+        self._size = 0
+        # tombstoned row ids, e.g. skills a re-ingested workflow file no longer defines
+        self.removed: Set[int] = set()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dim(self) -> int:
+        return 0 if self._codes is None else self._codes.shape[1]
+
+    @property
+    def codes(self) -> np.ndarray:
+        """(n, dim) view over the stored (possibly quantized) embeddings"""
+        if self._codes is None:
+            return np.empty((0, 0), dtype=QUANTIZATIONS[self.quantization])
+        return self._codes[:self._size]
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        """(n,) per-row int8 scales, None for float storage"""
+        return None if self._scales is None else self._scales[:self._size]
+
+    @property
+    def norms(self) -> np.ndarray:
+        """(n,) float32 view over the precomputed embedding norms"""
+        if self._norms is None:
+            return np.empty(0, dtype=np.float32)
+        return self._norms[:self._size]
+
+    @property
+    def exact(self) -> Optional[np.ndarray]:
+        """(n, dim) float32 embeddings used for re-ranking, None if not kept"""
+        return None if self._exact is None else self._exact[:self._size]
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """(n, dim) float32 embeddings (dequantized if float32 vectors aren't kept)"""
+        return self.vectors(slice(None))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes scanned by a brute-force search: codes, scales and norms"""
+        scales = self.scales
+        return self.codes.nbytes + self.norms.nbytes + (scales.nbytes if scales is not None else 0)
+
+    def vectors(self, rows) -> np.ndarray:
+        """float32 embeddings for `rows` (any numpy index), exact when available"""
+        if self.exact is not None:
+            return np.asarray(self.exact[rows], dtype=np.float32)
+        codes = np.asarray(self.codes[rows], dtype=np.float32)
+        if self.scales is not None:
+            codes *= self.scales[rows][..., None]
+        return codes
+
+    def _reserve(self, extra: int, dim: int):
+        """Make room for `extra` more rows, doubling the buffers when full"""
+        buffers = {
+            "_codes": (QUANTIZATIONS[self.quantization], (dim,)),
+            "_norms": (np.float32, ()),
+        }
+        if self.quantization == "int8":
+            buffers["_scales"] = (np.float32, ())
+        if self.keep_float32:
+            buffers["_exact"] = (np.float32, (dim,))
+
+        if self._codes is None:
+            capacity = max(self._initial_capacity, extra)
+        else:
+            if dim != self.dim:
+                raise ValueError(f"Embedding dimension {dim} does not match store dimension {self.dim}")
+            capacity = self._codes.shape[0]
+            if self._size + extra <= capacity:
+                return
+            while capacity < self._size + extra:
+                capacity *= 2
+
+        for name, (dtype, row_shape) in buffers.items():
+            buffer = np.empty((capacity,) + row_shape, dtype=dtype)
+            old = getattr(self, name)
+            if old is not None:
+                buffer[:self._size] = old[:self._size]
+            setattr(self, name, buffer)
+
+    def add(self, skill: Skill, embedding: Sequence[float]):
+        self.add_batch([skill], [embedding])
+
+    def _check_batch(self, skills: Sequence[Skill], embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(skills):
+            raise ValueError(f"Expected {len(skills)} embeddings, got array of shape {vectors.shape}")
+        return vectors
+
+    def add_batch(self, skills: Sequence[Skill], embeddings: Sequence[Sequence[float]]):
+        """Append skills and their embeddings (one row per skill)"""
+        vectors = self._check_batch(skills, embeddings)
+        n = vectors.shape[0]
+        if n == 0:
+            return
+        self._reserve(n, vectors.shape[1])
+        rows = slice(self._size, self._size + n)
+        codes, scales = quantize(vectors, self.quantization)
+        self._codes[rows] = codes
+        self._norms[rows] = np.linalg.norm(vectors, axis=1)
+        if scales is not None:
+            self._scales[rows] = scales
+        if self.keep_float32:
+            self._exact[rows] = vectors
+        self._size += n
+        self.skills.extend(skills)
+
+    def _dots(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dot products of float32 queries with the stored codes, chunked for quantized storage"""
+        codes = self.codes if rows is None else self.codes[rows]
+        if codes.dtype == np.float32:
+            dots = queries @ codes.T
+        else:
+            dots = np.empty((queries.shape[0], codes.shape[0]), dtype=np.float32)
+            for start in range(0, codes.shape[0], SCORE_CHUNK_ROWS):
+                chunk = np.asarray(codes[start:start + SCORE_CHUNK_ROWS], dtype=np.float32)
+                dots[:, start:start + chunk.shape[0]] = queries @ chunk.T
+        if self.scales is not None:
+            dots *= self.scales if rows is None else self.scales[rows]
+        return dots
+
+    def scores(self, query_embeddings: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of each query (rows of the result) against the stored skills (columns).
+
+        If `rows` is given only those stored skills are scored, in that order.
+        """
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        query_norms = np.linalg.norm(queries, axis=1)
+        norms = self.norms if rows is None else self.norms[rows]
+        denom = np.outer(query_norms, norms)
+        return self._dots(queries, rows) / np.maximum(denom, np.finfo(np.float32).tiny)
+
+    def select(self, query: np.ndarray, scores: np.ndarray, top_n: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Pick the top_n of one query's `scores` (over `rows`, or all stored rows).
+
+        For quantized storage with float32 vectors available, the best
+        rerank * top_n candidates are re-scored exactly first.
+        """
+        reranking = self.exact is not None and self.rerank > 1
+        best = top_k_indices(scores, top_n * self.rerank if reranking else top_n)
+        ids = best if rows is None else rows[best]
+        if not reranking:
+            return ids, scores[best]
+        exact = np.asarray(self.exact[ids], dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+        exact /= np.maximum(self.norms[ids] * np.linalg.norm(query), np.finfo(np.float32).tiny)
+        order = top_k_indices(exact, top_n)
+        return ids[order], exact[order]
+
+    def search_ids_batch(self, query_embeddings: Sequence[Sequence[float]], top_n: int = 10) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Brute-force search returning (row ids, similarities) per query, best first"""
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        if self._size == 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in range(queries.shape[0])]
+        scores = self.scores(queries)
+        return [self.select(query, row_scores, top_n) for query, row_scores in zip(queries, scores)]
+
+    def remove(self, rows: Iterable[int]):
+        """Tombstone rows so searches stop returning them"""
+        self.removed.update(int(row) for row in rows)
+
+    def hits(self, ids: np.ndarray, scores: np.ndarray) -> List[Tuple[Skill, float]]:
+        """Turn row ids and their similarities into (skill, similarity) pairs, skipping removed rows"""
+        return [(self.skills[int(i)], float(score)) for i, score in zip(ids, scores) if int(i) not in self.removed]
+
+    def search(self, query_embedding: Sequence[float], top_n: int = 10) -> List[Tuple[Skill, float]]:
+        return self.search_batch([query_embedding], top_n)[0]
+
+    def search_batch(self, query_embeddings: Sequence[Sequence[float]], top_n: int = 10) -> List[List[Tuple[Skill, float]]]:
+        """Return the top_n (skill, similarity) pairs for each query, best first"""
+        return [self.hits(ids, scores) for ids, scores in self.search_ids_batch(query_embeddings, top_n)]
+
+
+class _SkillRecords:
+    """Read-only, lazily decoded view over an append-only skills.jsonl sidecar.
+
+    `ends` holds the byte offset at which each record ends, so record i is
+    decoded (and cached) only when a search actually returns it. The file stays
+    open between reads, and iterating reads a range of records in one pass.
+    """
+    def __init__(self, path: Path, ends: np.ndarray):
+        self.path = path
+        self.ends = ends
+        self._cache: Dict[int, Skill] = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def _read(self, start: int, end: int) -> bytes:
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'rb')
+            self._file.seek(start)
+            return self._file.read(end - start)
+
+    def __getitem__(self, i: int) -> Skill:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i not in self._cache:
+            start = int(self.ends[i - 1]) if i > 0 else 0
+            self._cache[i] = json.loads(self._read(start, int(self.ends[i])))
+        return self._cache[i]
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None, chunk_bytes: int = 16 * 1024 * 1024) -> Iterator[Skill]:
+        """Decode records start..stop-1 in order, reading the sidecar sequentially in large chunks without caching them"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        i = start
+        while i < stop:
+            offset = int(self.ends[i - 1]) if i > 0 else 0
+            # at least one record per chunk, however large
+            last = max(i + 1, min(stop, int(np.searchsorted(self.ends, offset + chunk_bytes, side="right"))))
+            data = self._read(offset, int(self.ends[last - 1]))
+            position = 0
+            for end in self.ends[i:last].tolist():
+                yield json.loads(data[position:end - offset])
+                position = end - offset
+            i = last
+
+    def __iter__(self):
+        return self.iter_range()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class PersistentVectorStore(VectorStore):
+    """Vector DB for one base URL backed by append-only files in `directory`.
+
+    Layout:
+        meta.json       - base URL, embedding dimension and quantization
+        embeddings.f32  - raw (n, dim) float32 rows
+        codes.f16/.i8   - raw (n, dim) quantized rows (float16/int8 quantization only)
+        scales.f32      - raw (n,) float32 per-row scales (int8 quantization only)
+        norms.f32       - raw (n,) float32 norms
+        skills.jsonl    - one JSON skill record per line
+        skills.idx      - (n,) uint64 end offset of each record in skills.jsonl
+        removed.u64     - uint64 ids of tombstoned rows, appended by remove()
+
+    Opening a store only memory-maps the files, nothing is re-embedded or parsed,
+    and new skills are appended without rewriting existing data. The embeddings
+    file is written last so a row only becomes visible once its record, offset,
+    codes and norm are on disk; any partially written tail is truncated on open.
+    For quantized stores searches scan the codes and the float32 file is only
+    paged in to re-rank candidates.
+    """
+    META_FILE = "meta.json"
+    EMBEDDINGS_FILE = "embeddings.f32"
+    CODES_FILES = {"float16": "codes.f16", "int8": "codes.i8"}
+    SCALES_FILE = "scales.f32"
+    NORMS_FILE = "norms.f32"
+    SKILLS_FILE = "skills.jsonl"
+    INDEX_FILE = "skills.idx"
+    REMOVED_FILE = "removed.u64"
+
+    def __init__(self, directory: Union[str, Path], base_url: Optional[str] = None, quantization: str = "float32", rerank: int = 4):
+        super().__init__(quantization=quantization, rerank=rerank)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.base_url = base_url
+        self._dim = 0
+
+        meta_path = self.directory / self.META_FILE
+        if meta_path.exists():
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            self.base_url = meta.get("base_url", base_url)
+            self._dim = meta["dim"]
+            # an existing store keeps the quantization it was created with
+            self.quantization = meta.get("quantization", "float32")
+        self._open()
+
+    @staticmethod
+    def directory_name(base_url: str) -> str:
+        """Filesystem-safe directory name for a base URL"""
+        return re.sub(r'[^A-Za-z0-9.-]+', '_', base_url).strip('_')
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    def _files(self) -> List[Tuple[str, Any, Tuple[int, ...]]]:
+        """(file name, dtype, row shape) of every per-row file, in write order"""
+        files = [
+            (self.INDEX_FILE, np.uint64, ()),
+            (self.NORMS_FILE, np.float32, ()),
+        ]
+        if self.quantization == "int8":
+            files.append((self.SCALES_FILE, np.float32, ()))
+        if self.quantization != "float32":
+            files.append((self.CODES_FILES[self.quantization], QUANTIZATIONS[self.quantization], (self._dim,)))
+        files.append((self.EMBEDDINGS_FILE, np.float32, (self._dim,)))
+        return files
+
+    def _open(self):
+        """Memory-map the store, truncating any partially appended tail"""
+        removed_path = self._path(self.REMOVED_FILE)
+        self.removed = set(np.fromfile(removed_path, dtype=np.uint64).tolist()) if removed_path.exists() else set()
+        if not self._dim:
+            self._size = 0
+            self.skills = _SkillRecords(self._path(self.SKILLS_FILE), np.empty(0, dtype=np.uint64))
+            return
+
+        files = self._files()
+        size = None
+        for name, dtype, row_shape in files:
+            path = self._path(name)
+            row_bytes = np.dtype(dtype).itemsize * int(np.prod(row_shape))
+            rows = path.stat().st_size // row_bytes if path.exists() else 0
+            size = rows if size is None else min(size, rows)
+
+        for name, dtype, row_shape in files:
+            path = self._path(name)
+            length = size * np.dtype(dtype).itemsize * int(np.prod(row_shape))
+            if path.exists() and path.stat().st_size > length:
+                os.truncate(path, length)
+        skills_path = self._path(self.SKILLS_FILE)
+        skills_end = int(np.fromfile(self._path(self.INDEX_FILE), dtype=np.uint64, count=size)[-1]) if size else 0
+        if skills_path.exists() and skills_path.stat().st_size > skills_end:
+            os.truncate(skills_path, skills_end)
+        self._remap(size)
+
+    def _remap(self, size: int):
+        """Map the first `size` rows of every file; the skills sidecar keeps its open handle and decoded records"""
+        maps = {name: self._map(name, dtype, (size,) + row_shape) for name, dtype, row_shape in self._files()}
+        self._size = size
+        self._norms = maps[self.NORMS_FILE]
+        self._scales = maps.get(self.SCALES_FILE)
+        if self.quantization == "float32":
+            self._codes, self._exact = maps[self.EMBEDDINGS_FILE], None
+        else:
+            self._codes, self._exact = maps[self.CODES_FILES[self.quantization]], maps[self.EMBEDDINGS_FILE]
+        if isinstance(getattr(self, "skills", None), _SkillRecords):
+            self.skills.ends = maps[self.INDEX_FILE]
+        else:
+            self.skills = _SkillRecords(self._path(self.SKILLS_FILE), maps[self.INDEX_FILE])
+
+    def _map(self, name: str, dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        # np.memmap refuses zero-length files, so an empty store is a plain empty array
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode='r', shape=shape)
+
+    def add_batch(self, skills: Sequence[Skill], embeddings: Sequence[Sequence[float]]):
+        """Append skills and their embeddings to the on-disk files, then remap them"""
+        vectors = self._check_batch(skills, embeddings)
+        if vectors.shape[0] == 0:
+            return
+        if not self._dim:
+            self._dim = vectors.shape[1]
+            with open(self._path(self.META_FILE), 'w') as f:
+                json.dump({"base_url": self.base_url, "dim": self._dim, "quantization": self.quantization}, f)
+        elif vectors.shape[1] != self._dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self._dim}")
+
+        records = [(json.dumps(skill) + "\n").encode() for skill in skills]
+        skills_path = self._path(self.SKILLS_FILE)
+        offset = skills_path.stat().st_size if skills_path.exists() else 0
+        ends = offset + np.cumsum([len(record) for record in records], dtype=np.uint64)
+        codes, scales = quantize(vectors, self.quantization)
+        rows = {
+            self.INDEX_FILE: ends.astype(np.uint64),
+            self.NORMS_FILE: np.linalg.norm(vectors, axis=1).astype(np.float32),
+            self.SCALES_FILE: scales,
+            self.CODES_FILES.get(self.quantization): codes,
+            self.EMBEDDINGS_FILE: vectors,
+        }
+
+        with open(skills_path, 'ab') as f:
+            f.write(b"".join(records))
+        for name, _, _ in self._files():
+            with open(self._path(name), 'ab') as f:
+                f.write(np.ascontiguousarray(rows[name]).tobytes())
+        self._remap(self._size + len(records))
+
+
+    def remove(self, rows: Iterable[int]):
+        """Tombstone rows, persisted so they stay removed when the store is reopened"""
+        rows = sorted({int(row) for row in rows} - self.removed)
+        if not rows:
+            return
+        with open(self._path(self.REMOVED_FILE), 'ab') as f:
+            f.write(np.asarray(rows, dtype=np.uint64).tobytes())
+        super().remove(rows)
+
+
+def open_persistent_stores(root: Union[str, Path], rerank: int = 4) -> Dict[str, PersistentVectorStore]:
+    """Memory-map every persistent vector DB under `root`, keyed by base URL"""
+    stores = {}
+    root = Path(root)
+    if not root.exists():
+        return stores
+    for meta_path in sorted(root.glob(f"*/{PersistentVectorStore.META_FILE}")):
+        store = PersistentVectorStore(meta_path.parent, rerank=rerank)
+        if store.base_url:
+            stores[store.base_url] = store
+    return stores
@@ -0,0 +1,263 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+import ast
+import copy
+import hashlib
+import json
+import re
+
+from src.services.skill_retrieval_service import IngestionReport, SkillRetrievalService
+from src.utils.data import get_base_url
+from src.utils.redaction import redact_call
+
+WORKFLOW_FILE = "refactored_workflow.py"
+RECORDING_FILE = "playwright_workflow.py"
+
+_URL = re.compile(r'https?://[^\s"\']+')
+
+
+@dataclass
+class WorkflowFunction:
+    """A learned skill: one function of a refactored_workflow.py that acts on a `page`"""
+    name: str
+    signature: str
+    docstring: str
+    body_hash: str
+    source: str
+    url: str
+    session_id: str
+    path: str
+
+    def to_skill(self) -> Dict[str, Any]:
+        """Skill record in the format SkillRetrievalService ingests"""
+        return {
+            "url": self.url,
+            "name": self.name,
+            "signature": self.signature,
+            "docstring": self.docstring,
+            "code": self.source,
+            "body_hash": self.body_hash,
+            "session_id": self.session_id,
+        }
+
+
+@dataclass
+class WorkflowFile:
+    """Parsed refactored_workflow.py: its skills plus the imports they need to run"""
+    path: str
+    session_id: str
+    content_hash: str
+    url: str
+    imports: List[str] = field(default_factory=list)
+    functions: List[WorkflowFunction] = field(default_factory=list)
+    # the demonstrated order of the skills, e.g. ["set_date_range('2020-01', '2024-12')", ...]
+    sequence: List[str] = field(default_factory=list)
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _takes_page(node: ast.FunctionDef) -> bool:
+    args = node.args.posonlyargs + node.args.args
+    if not args:
+        return False
+    annotation = ast.unparse(args[0].annotation) if args[0].annotation else ""
+    return args[0].arg == "page" or annotation.endswith("Page")
+
+
+def _signature(node: ast.FunctionDef) -> str:
+    """Signature as the agent calls it, i.e. without the leading `page` argument"""
+    arguments = copy.copy(node.args)
+    if arguments.posonlyargs:
+        arguments.posonlyargs = arguments.posonlyargs[1:]
+    else:
+        arguments.args = arguments.args[1:]
+    positional = len(arguments.posonlyargs) + len(arguments.args)
+    arguments.defaults = arguments.defaults[len(arguments.defaults) - positional:] if positional else []
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{node.name}({ast.unparse(arguments)}){returns}"
+
+
+def _body_hash(node: ast.FunctionDef) -> str:
+    """Hash of the function's code ignoring its docstring, comments and formatting"""
+    body = node.body[1:] if ast.get_docstring(node) is not None else node.body
+    return _content_hash("\n".join(ast.dump(statement) for statement in body).encode())
+
+
+def _call_sequence(tree: ast.Module, names: Set[str]) -> List[str]:
+    """Calls to the file's skills in its driver (e.g. main_workflow), as WORKFLOW actions without `page`.
+
+    Arguments of credential parameters (username, password, passcode...) are redacted
+    to SECRET.<parameter>, so recorded credentials never reach the manifest.
+    """
+    parameters = {
+        node.name: [arg.arg for arg in node.args.posonlyargs + node.args.args][1:]
+        for node in tree.body if isinstance(node, ast.FunctionDef) and node.name in names
+    }
+    best: List[ast.Call] = []
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef) or node.name in names:
+            continue
+        calls = [
+            call for call in ast.walk(node)
+            if isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id in names
+        ]
+        if len(calls) > len(best):
+            best = sorted(calls, key=lambda call: (call.lineno, call.col_offset))
+    sequence = []
+    for call in best:
+        call = copy.copy(call)
+        call.args = call.args[1:]
+        sequence.append(ast.unparse(redact_call(call, parameters.get(call.func.id, []))))
+    return sequence
+
+
+def _find_base_url(*sources: str) -> Optional[str]:
+    for source in sources:
+        match = _URL.search(source)
+        if match:
+            return get_base_url(match.group(0))
+    return None
+
+
+def parse_workflow_file(path: Path, default_url: Optional[str] = None) -> WorkflowFile:
+    """Extract the skills of one refactored_workflow.py with `ast`.
+
+    The tool a workflow belongs to is the base of the first URL in the file, or in
+    the raw Playwright recording next to it, falling back to `default_url`.
+    """
+    data = path.read_bytes()
+    source = data.decode()
+    tree = ast.parse(source, filename=str(path))
+
+    recording = path.parent / RECORDING_FILE
+    url = _find_base_url(source, recording.read_text() if recording.exists() else "") or default_url
+    if url is None:
+        raise ValueError(f"Could not determine which site {path} automates, pass a default_url")
+
+    workflow = WorkflowFile(path=str(path), session_id=path.parent.name, content_hash=_content_hash(data), url=url)
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            workflow.imports.append(ast.get_source_segment(source, node))
+        elif isinstance(node, ast.FunctionDef) and not node.name.startswith("_") and _takes_page(node):
+            workflow.functions.append(WorkflowFunction(
+                name=node.name,
+                signature=_signature(node),
+                docstring=ast.get_docstring(node) or "",
+                body_hash=_body_hash(node),
+                source=ast.get_source_segment(source, node),
+                url=url,
+                session_id=workflow.session_id,
+                path=str(path),
+            ))
+    workflow.sequence = _call_sequence(tree, {function.name for function in workflow.functions})
+    return workflow
+
+
+class WorkflowIngester:
+    """Incrementally feeds every <workflows_dir>/<session>/refactored_workflow.py into the skill store.
+
+    A JSON manifest records the content hash and parsed skills of each ingested
+    file. Files whose content hash is unchanged are skipped without being parsed,
+    and in changed files only functions with a new (url, name, body hash) are
+    embedded, so re-indexing a large workflow tree is nearly free. Skills that no
+    file defines anymore, because their file changed or was deleted, are removed
+    from the store.
+    """
+    def __init__(self, service: SkillRetrievalService, workflows_dir: str = "src/scripts/workflows", manifest_path: Optional[str] = None, default_url: Optional[str] = None):
+        self.service = service
+        self.workflows_dir = Path(workflows_dir)
+        if manifest_path is None:
+            manifest_dir = service.store_dir if service.store_dir else self.workflows_dir
+            manifest_path = manifest_dir / "ingested_workflows.json"
+        self.manifest_path = Path(manifest_path)
+        self.default_url = default_url
+        self.manifest: Dict[str, Dict[str, Any]] = self.load_manifest(self.manifest_path)
+
+    @staticmethod
+    def load_manifest(path: Path) -> Dict[str, Dict[str, Any]]:
+        """Ingested files keyed by path, each with its content_hash, url, imports and functions"""
+        path = Path(path)
+        if not path.exists():
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        tmp_path.replace(self.manifest_path)
+
+    @staticmethod
+    def _skill_keys(entries: Iterable[Dict[str, Any]]) -> Set[Tuple[str, str, str]]:
+        """(url, name, body hash) of every skill the manifest entries define, the key a skill is stored under"""
+        return {
+            (function["url"], function["name"], function["body_hash"])
+            for entry in entries
+            for function in entry["functions"]
+        }
+
+    def _indexed_skills(self) -> Set[Tuple[str, str, str]]:
+        return self._skill_keys(self.manifest.values())
+
+    def ingest(self, batch_size: int = 64) -> Tuple[IngestionReport, Dict[str, int]]:
+        """Ingest new and changed workflow files
+        Returns:
+            The IngestionReport of the embedded, removed and unparsable skills, and file counts
+            (scanned, skipped, parsed, failed, deleted)
+        """
+        counts = {"scanned": 0, "skipped": 0, "parsed": 0, "failed": 0, "deleted": 0}
+        indexed = self._indexed_skills()
+        parsed: List[WorkflowFile] = []
+        new_functions: List[WorkflowFunction] = []
+        failed_files: Dict[str, str] = {}
+        paths = sorted(self.workflows_dir.glob(f"*/{WORKFLOW_FILE}"))
+
+        for path in paths:
+            counts["scanned"] += 1
+            entry = self.manifest.get(str(path))
+            if entry and entry["content_hash"] == _content_hash(path.read_bytes()):
+                counts["skipped"] += 1
+                continue
+            try:
+                workflow = parse_workflow_file(path, default_url=self.default_url)
+            except (SyntaxError, ValueError, UnicodeDecodeError) as e:
+                counts["failed"] += 1
+                failed_files[str(path)] = f"{type(e).__name__}: {e}"
+                print(f"Error parsing workflow {path}: {e}")
+                continue
+            counts["parsed"] += 1
+            parsed.append(workflow)
+            for function in workflow.functions:
+                key = (function.url, function.name, function.body_hash)
+                if key not in indexed:
+                    indexed.add(key)
+                    new_functions.append(function)
+
+        report = self.service.add_skills((function.to_skill() for function in new_functions), batch_size=batch_size)
+
+        # files with a skill that failed to ingest are left out of the manifest so they're retried next time
+        failed_paths = {new_functions[error.index].path for error in report.errors}
+        previous = self._indexed_skills()
+        for workflow in parsed:
+            if workflow.path in failed_paths:
+                continue
+            entry = asdict(workflow)
+            self.manifest[workflow.path] = entry
+        # only files under workflows_dir are managed here, a manifest may come from elsewhere
+        on_disk = {str(path) for path in paths}
+        for path in [path for path in self.manifest if path not in on_disk and Path(path).parent.parent == self.workflows_dir]:
+            del self.manifest[path]
+            counts["deleted"] += 1
+
+        # skills no file defines anymore, e.g. edited or deleted ones, stop being retrievable
+        stale = previous - self._indexed_skills()
+        if stale:
+            report.removed = self.service.remove_skills(stale)
+        report.failed_files = failed_files
+        self._save_manifest()
+        return report, counts
@@ -0,0 +1,105 @@
+from typing import Dict, Iterable, Optional, Tuple
+from pathlib import Path
+import sqlite3
+import threading
+import time
+
+class DiskCache:
+    """Size-bounded persistent key/value cache backed by a single SQLite file.
+
+    Values are raw bytes. Once the stored values exceed `max_bytes`, the least
+    recently used entries are evicted until the cache is back under
+    `evict_to` of the limit.
+    """
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024, evict_to: float = 0.9):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.evict_to = evict_to
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Look up several keys at once, returning only the ones present"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        if not keys:
+            return found
+        with self._lock:
+            # stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(f"SELECT key, value FROM entries WHERE key IN ({placeholders})", chunk).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?", [(now, key) for key in found])
+                self._conn.commit()
+        return found
+
+    def put(self, key: str, value: bytes):
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]):
+        items = list(items)
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, value in items:
+                row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                if row:
+                    self._total_bytes -= row[0]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                    (key, sqlite3.Binary(value), len(value), now),
+                )
+                self._total_bytes += len(value)
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_bytes -= row[0]
+
+    def _evict(self):
+        """Drop least recently used entries until under evict_to * max_bytes (lock must be held)"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * self.evict_to
+        cursor = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC")
+        evicted = []
+        for key, size in cursor:
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,45 +1,161 @@
-from typing import Dict, List, Type, Union, Optional
+from typing import Any, Dict, List, Type, Union, Optional, Sequence
+from dataclasses import dataclass
 from pydantic import BaseModel
-from litellm import completion, supports_response_schema
+from litellm import acompletion, completion, supports_response_schema, token_counter
+import asyncio
 import json
+import random
+
+from src.utils.llm_cache import ResponseCache, ResponseCacheMiss
+from src.utils.rate_limiter import RateLimiter, get_rate_limiter
+
+# status codes worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+@dataclass
+class GenerationResult:
+    """Outcome of one request of a batch: its output, or the error that ended it"""
+    output: Optional[Union[BaseModel, str]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 class LiteLLMClient:
-    def __init__(self, model="gpt-4o"):
-        """Initialize LLM Client."""
+    def __init__(self, model="gpt-4o", cache: Optional[ResponseCache] = None, max_concurrency: int = 8, rpm: Optional[int] = None, tpm: Optional[int] = None, max_retries: int = 4):
+        """Initialize LLM Client. Without a cache, the one configured by LLM_CACHE_PATH is used, if any.
+
+        `max_concurrency` bounds the requests in flight in generate_many; `rpm`/`tpm` are the
+        model's requests and tokens per minute quota, shared by every client of the model.
+        """
         self.model = model
+        self.cache = cache if cache is not None else ResponseCache.from_env()
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.rate_limiter: Optional[RateLimiter] = get_rate_limiter(model, rpm, tpm) if rpm or tpm else None
+
+    def _parse(self, content: Any, response_format: Optional[Type[BaseModel]], strict: bool = False) -> Union[BaseModel, str]:
+        # If response_format is provided, try to parse into the schema
+        if response_format:
+            if isinstance(content, str):
+                try:
+                    content_dict = json.loads(content)
+                    return response_format(**content_dict)
+                except json.JSONDecodeError:
+                    if strict:
+                        raise ValueError("Expected JSON for schema but received plain string")
+                    print("Expected JSON for schema but received plain string")
+                    return None
+            return response_format(**content)
+
+        # If no response_format, just return the content string
+        return content
 
     def generate(self, messages: List[Dict[str, str]], response_format: Optional[Type[BaseModel]]=None) -> Union[BaseModel, str]:
-        """LLM completion function that supports all models and structured output."""
+        """LLM completion function that supports all models and structured output.
+
+        Responses are served from and stored in the cache when there is one; in its
+        replay-only mode a request without a cached response raises ResponseCacheMiss.
+        """
         try:
             if response_format and not supports_response_schema(model=self.model):
                 print(f"Model {self.model} does not support structured outputs")
                 return None
-                
+
+            key = ResponseCache.key(self.model, messages, response_format) if self.cache else None
+            content = self.cache.get(key) if self.cache else None
+            if content is not None:
+                return self._parse(content, response_format)
+
             response = completion(
                 model=self.model,
                 messages=messages,
                 response_format=response_format if response_format else None
             )
-            
+
             content = response.choices[0].message.content
-            
-            # If response_format is provided, try to parse into the schema
-            if response_format:
-                if isinstance(content, str):
-                    try:
-                        content_dict = json.loads(content)
-                        return response_format(**content_dict)
-                    except json.JSONDecodeError:
-                        print("Expected JSON for schema but received plain string")
-                        return None
-                return response_format(**content)
-            
-            # If no response_format, just return the content string
-            return content
-            
+            result = self._parse(content, response_format)
+            # only responses that parsed are worth replaying
+            if self.cache and result is not None:
+                self.cache.put(key, content)
+            return result
+
+        except ResponseCacheMiss:
+            raise
         except Exception as e:
             print(f"Error generating response: {e}")
             return None
-    
+
     def __call__(self, messages: List[Dict[str, str]], response_format: Optional[Type[BaseModel]]=None) -> Union[BaseModel, str]:
         return self.generate(messages, response_format)
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        status_code = getattr(error, "status_code", None)
+        return status_code in RETRYABLE_STATUS_CODES or (isinstance(status_code, int) and status_code >= 500)
+
+    def _estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        try:
+            return token_counter(model=self.model, messages=messages)
+        except Exception:
+            return len(json.dumps(messages, default=str)) // 4
+
+    async def _complete(self, messages: List[Dict[str, str]], response_format: Optional[Type[BaseModel]], result: GenerationResult) -> Any:
+        """Response content from the provider, retrying retryable errors with full-jitter exponential backoff"""
+        estimate = self._estimate_tokens(messages) if self.rate_limiter else 0
+        for attempt in range(self.max_retries + 1):
+            result.attempts = attempt + 1
+            reservation = await self.rate_limiter.acquire(estimate) if self.rate_limiter else None
+            try:
+                response = await acompletion(
+                    model=self.model,
+                    messages=messages,
+                    response_format=response_format if response_format else None
+                )
+            except Exception as e:
+                if reservation is not None:
+                    # a failed call used no tokens, it still counts as a request
+                    self.rate_limiter.settle(reservation, 0)
+                if attempt == self.max_retries or not self._retryable(e):
+                    raise
+                await asyncio.sleep(random.uniform(0, min(60.0, 2 ** attempt)))
+                continue
+            usage = getattr(response, "usage", None)
+            if reservation is not None and usage is not None:
+                self.rate_limiter.settle(reservation, usage.total_tokens)
+            return response.choices[0].message.content
+
+    async def agenerate(self, messages: List[Dict[str, str]], response_format: Optional[Type[BaseModel]]=None) -> GenerationResult:
+        """Async generate that reports errors in the result instead of printing them"""
+        result = GenerationResult()
+        try:
+            if response_format and not supports_response_schema(model=self.model):
+                raise ValueError(f"Model {self.model} does not support structured outputs")
+            key = ResponseCache.key(self.model, messages, response_format) if self.cache else None
+            content = self.cache.get(key) if self.cache else None
+            if content is not None:
+                result.output = self._parse(content, response_format, strict=True)
+                return result
+            content = await self._complete(messages, response_format, result)
+            result.output = self._parse(content, response_format, strict=True)
+            if self.cache:
+                self.cache.put(key, content)
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+        return result
+
+    async def agenerate_many(self, batch: Sequence[List[Dict[str, str]]], response_format: Optional[Type[BaseModel]]=None, max_concurrency: Optional[int]=None) -> List[GenerationResult]:
+        """agenerate every conversation of the batch with at most `max_concurrency` requests in flight, results in batch order"""
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def bounded(messages):
+            async with semaphore:
+                return await self.agenerate(messages, response_format)
+
+        return await asyncio.gather(*(bounded(messages) for messages in batch))
+
+    def generate_many(self, batch: Sequence[List[Dict[str, str]]], response_format: Optional[Type[BaseModel]]=None, max_concurrency: Optional[int]=None) -> List[GenerationResult]:
+        """Blocking agenerate_many, for callers without an event loop"""
+        return asyncio.run(self.agenerate_many(batch, response_format, max_concurrency))
@@ -0,0 +1,65 @@
+from typing import Any, Dict, List, Optional, Type
+from pydantic import BaseModel
+import hashlib
+import json
+import os
+import time
+
+from src.utils.disk_cache import DiskCache
+
+
+class ResponseCacheMiss(LookupError):
+    """Raised in replay-only mode when a request has no cached response"""
+
+
+class ResponseCache:
+    """Content-addressed cache of LLM responses in a size-bounded SQLite DiskCache.
+
+    Entries are keyed on the sha256 of (model, messages, response_format JSON schema)
+    and expire after `ttl_seconds` (never if None). In `replay_only` mode a miss
+    raises ResponseCacheMiss instead of letting the client call the provider, so
+    tests and reprocessing jobs either run fully offline or fail loudly.
+    """
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_bytes: int = 256 * 1024 * 1024, replay_only: bool = False):
+        self.disk = DiskCache(path, max_bytes=max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Cache configured by LLM_CACHE_PATH, LLM_CACHE_TTL (seconds) and LLM_CACHE_REPLAY_ONLY, None if no path is set"""
+        path = os.environ.get("LLM_CACHE_PATH")
+        if not path:
+            return None
+        ttl = os.environ.get("LLM_CACHE_TTL")
+        replay_only = os.environ.get("LLM_CACHE_REPLAY_ONLY", "").lower() in ("1", "true", "yes")
+        return cls(path, ttl_seconds=float(ttl) if ttl else None, replay_only=replay_only)
+
+    @staticmethod
+    def key(model: str, messages: List[Dict[str, Any]], response_format: Optional[Type[BaseModel]] = None) -> str:
+        schema = response_format.model_json_schema() if response_format else None
+        payload = json.dumps({"model": model, "messages": messages, "schema": schema}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached response content, or None on a miss (ResponseCacheMiss in replay-only mode)"""
+        value = self.disk.get(key)
+        entry = json.loads(value) if value else None
+        if entry is not None and self.ttl_seconds is not None and time.time() - entry["created"] > self.ttl_seconds:
+            self.disk.delete(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            if self.replay_only:
+                raise ResponseCacheMiss(f"No cached response for request {key[:12]} in replay-only mode")
+            return None
+        self.hits += 1
+        return entry["content"]
+
+    def put(self, key: str, content: Any):
+        self.disk.put(key, json.dumps({"content": content, "created": time.time()}).encode())
+
+    def close(self):
+        self.disk.close()
@@ -0,0 +1,74 @@
+from typing import Deque, Dict, List, Optional
+from collections import deque
+import asyncio
+import threading
+import time
+
+class RateLimiter:
+    """Sliding-window limiter for a model's requests and tokens per minute.
+
+    Each request reserves its estimated tokens when it starts; `settle` replaces
+    the estimate with the tokens the provider reported, 0 for a failed call. A
+    request larger than the whole token limit could never fit and is rejected. State is guarded by a
+    thread lock, not an asyncio one, so one limiter can be shared by every client
+    and event loop of a process.
+    """
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None, window: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        # [start time, tokens] of the requests in the current window
+        self._events: Deque[List] = deque()
+        self._lock = threading.Lock()
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a request of `tokens` fits in the window (lock must be held)"""
+        while self._events and self._events[0][0] <= now - self.window:
+            self._events.popleft()
+        waits = [0.0]
+        if self.rpm and len(self._events) >= self.rpm:
+            waits.append(self._events[len(self._events) - self.rpm][0] + self.window - now)
+        if self.tpm and self._events:
+            excess = sum(event[1] for event in self._events) + tokens - self.tpm
+            freed = 0
+            for start, used in self._events:
+                if excess <= 0:
+                    break
+                freed += used
+                if freed >= excess:
+                    waits.append(start + self.window - now)
+                    break
+        return max(waits)
+
+    async def acquire(self, tokens: int = 0) -> List:
+        """Wait until the request fits the limits and reserve it; returns the reservation to settle"""
+        if self.tpm and tokens > self.tpm:
+            raise ValueError(f"Request of {tokens} tokens exceeds the limit of {self.tpm} tokens per {self.window:g}s")
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._wait_time(tokens, now)
+                if wait <= 0:
+                    event = [now, tokens]
+                    self._events.append(event)
+                    return event
+            await asyncio.sleep(wait)
+
+    def settle(self, event: List, tokens: int):
+        with self._lock:
+            event[1] = tokens
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(model: str, rpm: Optional[int] = None, tpm: Optional[int] = None) -> RateLimiter:
+    """The process-wide limiter of a model, so every client of the model shares its quota"""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = _limiters[model] = RateLimiter(rpm=rpm, tpm=tpm)
+        else:
+            limiter.rpm = rpm or limiter.rpm
+            limiter.tpm = tpm or limiter.tpm
+        return limiter
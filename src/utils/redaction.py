@@ -0,0 +1,77 @@
+from typing import List, Optional, Sequence, Tuple
+import ast
+import copy
+import os
+import re
+
+# skill parameters whose demonstrated values are credentials, matched on the parameter's name
+_SECRET_PARAMETER = re.compile(r'user_?name|login|password|passwd|pwd|pass_?code|passphrase|^pin$|otp|secret|token|api_?key|credential', re.IGNORECASE)
+# redacted arguments read SECRET.<parameter> in a call
+SECRET = "SECRET"
+
+
+def is_secret_parameter(name: str) -> bool:
+    return bool(_SECRET_PARAMETER.search(name))
+
+
+def _placeholder(parameter: str) -> ast.Attribute:
+    return ast.Attribute(value=ast.Name(id=SECRET, ctx=ast.Load()), attr=parameter, ctx=ast.Load())
+
+
+def redact_call(call: ast.Call, parameters: Sequence[str]) -> ast.Call:
+    """Copy of a skill call with the values of its secret parameters replaced by SECRET.<parameter>.
+
+    `parameters` are the skill's parameter names in order, matching the call's positional arguments.
+    """
+    call = copy.copy(call)
+    call.args = [
+        _placeholder(parameters[i]) if i < len(parameters) and is_secret_parameter(parameters[i]) else arg
+        for i, arg in enumerate(call.args)
+    ]
+    call.keywords = [
+        ast.keyword(arg=keyword.arg, value=_placeholder(keyword.arg)) if keyword.arg and is_secret_parameter(keyword.arg) else keyword
+        for keyword in call.keywords
+    ]
+    return call
+
+
+def redact(call: str, parameters: Sequence[str]) -> str:
+    """redact_call on the text of a call, e.g. perform_login('jdoe', 'hunter2') -> perform_login(SECRET.username, SECRET.password)"""
+    try:
+        tree = ast.parse(call, mode="eval")
+    except SyntaxError:
+        return call
+    if not isinstance(tree.body, ast.Call):
+        return call
+    return ast.unparse(redact_call(tree.body, parameters))
+
+
+def secret_value(parameter: str, goal: str) -> Optional[str]:
+    """Value of a secret given in the goal ("password: hunter2", "username jdoe"), else in WORKFLOW_SECRET_<PARAMETER>"""
+    label = r'[\s_]*'.join(re.escape(part) for part in parameter.split("_") if part)
+    match = re.search(rf'\b{label}\b\s*(?:is\b|:|=)?\s*["\']?([^\s"\',;]+)', goal, re.IGNORECASE)
+    if match:
+        return match.group(1)
+    return os.environ.get(f"WORKFLOW_SECRET_{parameter.upper()}")
+
+
+def fill_secrets(call: str, goal: str) -> Tuple[str, List[str]]:
+    """The call with its SECRET.<parameter> placeholders filled in, and the parameters no value was found for"""
+    try:
+        tree = ast.parse(call, mode="eval")
+    except SyntaxError:
+        return call, []
+    missing = []
+
+    class Filler(ast.NodeTransformer):
+        def visit_Attribute(self, node):
+            if not (isinstance(node.value, ast.Name) and node.value.id == SECRET):
+                return self.generic_visit(node)
+            value = secret_value(node.attr, goal)
+            if value is None:
+                missing.append(node.attr)
+                return node
+            return ast.Constant(value)
+
+    filled = Filler().visit(tree)
+    return ast.unparse(filled), missing
@@ -1,13 +1,24 @@
+from typing import Optional
 from playwright.sync_api import sync_playwright
 
-def run_with_auth_state(auth_json_path, url):
+from src.services.browser_pool import BrowserPool
+
+def run_with_auth_state(auth_json_path, url, pool: Optional[BrowserPool] = None):
     """
     Run a Playwright session using a saved authentication state.
     
     Args:
         auth_json_path: Path to the auth.json file
         url: URL to navigate to with the authenticated state
+        pool: Optional running BrowserPool to take a warm, pre-authenticated page from
+              instead of launching a new browser
     """
+    if pool is not None:
+        with pool.page(storage_state=auth_json_path, url=url):
+            print(f"Successfully loaded authenticated session for {url}")
+            input("Press Enter to release the page...")
+        return
+
     with sync_playwright() as playwright:
         browser = playwright.chromium.launch(headless=False)
         context = browser.new_context(storage_state=auth_json_path)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from src.services.ann_index import IVFIndex, recall_at_k
+from src.services.vector_store import VectorStore
+
+SIZE = 20000
+DIM = 128
+# ~sqrt(SIZE) cells, the low end of the usual 1-16 * sqrt(N)
+NLIST = 141
+
+
+@pytest.fixture(scope="module")
+def gaussian_store() -> VectorStore:
+    """Isotropic Gaussian embeddings: no cluster structure for the cells to follow, IVF's hard case"""
+    rng = np.random.default_rng(0)
+    store = VectorStore()
+    store.add_batch([{"url": "https://example.com", "name": f"skill_{i}"} for i in range(SIZE)], rng.standard_normal((SIZE, DIM)).astype(np.float32))
+    return store
+
+
+@pytest.fixture(scope="module")
+def gaussian_queries() -> np.ndarray:
+    return np.random.default_rng(1).standard_normal((200, DIM)).astype(np.float32)
+
+
+def ivf_recall(store: VectorStore, queries: np.ndarray, nprobe: int) -> float:
+    index = IVFIndex(store, nlist=NLIST, nprobe=nprobe, min_size=1)
+    index.sync()
+    return recall_at_k(index, queries, k=10)
+
+
+def test_recall_on_isotropic_gaussian(gaussian_store, gaussian_queries):
+    # scoring 32 of 141 cells (~23% of the store) finds over half of the exact top 10
+    assert ivf_recall(gaussian_store, gaussian_queries, nprobe=32) >= 0.5
+
+
+def test_recall_grows_with_nprobe(gaussian_store, gaussian_queries):
+    recalls = [ivf_recall(gaussian_store, gaussian_queries, nprobe) for nprobe in (8, 32, NLIST)]
+    assert recalls[0] < recalls[1] < recalls[2]
+    # probing every cell is exact search
+    assert recalls[2] == pytest.approx(1.0)